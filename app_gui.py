@@ -26,16 +26,17 @@ except ImportError as e:
 class Worker(QThread):
     finished = Signal(dict)
     
-    def __init__(self, city):
+    def __init__(self, city, generator: CouponGenerator):
         super().__init__()
         self.city = city
+        # Shared across clicks: one session/pooled connection, warm between requests
+        self.generator = generator
         
     def run(self):
-        gen = CouponGenerator()
         # Always use today's date
         today = datetime.date.today()
         try:
-            result = gen.process(self.city, today)
+            result = self.generator.process(self.city, today)
             self.finished.emit(result)
         except Exception as e:
             self.finished.emit({"error": str(e)})
@@ -46,6 +47,9 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("TJK Yapay Zeka Kupon Oluşturucu")
         self.setGeometry(100, 100, 600, 800)
         
+        # Reused by every Worker (the button is disabled while one runs)
+        self.generator = CouponGenerator()
+        
         self.setup_ui()
         
     def setup_ui(self):
@@ -121,7 +125,7 @@ class MainWindow(QMainWindow):
         self.txt_eco.clear()
         self.txt_wide.clear()
         
-        self.worker = Worker(city)
+        self.worker = Worker(city, self.generator)
         self.worker.finished.connect(self.handle_result)
         self.worker.start()
         
@@ -144,6 +148,10 @@ class MainWindow(QMainWindow):
         self.last_result = result
         self.btn_telegram.setEnabled(True)
         
+    def closeEvent(self, event):
+        self.generator.close()
+        super().closeEvent(event)
+        
     def send_telegram(self):
         # Mock Telegram Sending for now as no token provided
         # In real scenario, we would request token or read from config
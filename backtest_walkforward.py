@@ -9,8 +9,9 @@ from sqlalchemy import func
 # Add src to path
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
-from tjk.storage.db import get_db
+from tjk.storage.db import get_read_db
 from tjk.storage.schema import RaceModel, EntryModel
+from tjk.storage.read_repo import RaceReadRepository
 from tjk.analysis.history_processor import HistoryProcessor
 from tjk.analysis.decision_engine import DecisionEngine
 from tjk.analysis.calibrator import ScoreCalibrator
@@ -43,7 +44,7 @@ def get_actual_result(db, city, race_no):
 
 def run_backtest():
     ensure_dirs()
-    db = next(get_db())
+    db = next(get_read_db())
     
     print(f"🚀 STARTING WALK-FORWARD BACKTEST")
     print(f"📅 Range: {START_DATE} -> {END_DATE}")
@@ -58,6 +59,7 @@ def run_backtest():
     processor.build_profiles(start_date=history_start, end_date=START_DATE)
     
     engine = DecisionEngine(db, processor.profiles)
+    read_repo = RaceReadRepository(db)
     calibrator = ScoreCalibrator()
     
     # Prepare Result Log
@@ -83,7 +85,7 @@ def run_backtest():
             print(f"\n🔄 [{step}/{total_days}] Processing {current_date}...")
             
             # 1. Identify Races
-            races_query = db.query(RaceModel).filter(RaceModel.date == current_date).all()
+            races_query = read_repo.races_for_day(current_date)  # Entries included, one query
             if not races_query:
                 print(f"   ⚠️ No races found for {current_date}")
                 current_date += datetime.timedelta(days=1)
@@ -94,7 +96,7 @@ def run_backtest():
             
             # 2. Predict (Using profiles UP TO yesterday)
             # DecisionEngine uses self.profiles (which are currently up to yesterday)
-            raw_preds = engine.analyze_daily_program(current_date, cities)
+            raw_preds = engine.analyze_races(races_query)
             
             if not raw_preds:
                 print("   ⚠️ No predictions generated.")
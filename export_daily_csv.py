@@ -8,17 +8,17 @@ from sqlalchemy import text
 # Add src to path
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
-from tjk.storage.db import get_db
-from tjk.storage.schema import RaceModel
+from tjk.storage.db import get_read_db
+from tjk.storage.read_repo import RaceReadRepository
 
 def export_today_csv():
-    db = next(get_db())
+    db = next(get_read_db())
     today = date(2025, 12, 20) # Hardcoded for this specific run as per "autonomous" simulation ensuring file exists
     
     # Or use date.today() if we trust system time is 2025-12-20 (It is)
     today = date.today()
 
-    races = db.query(RaceModel).filter(RaceModel.date == today).all()
+    races = RaceReadRepository(db).races_for_day(today)
     
     output_dir = "data/daily"
     if not os.path.exists(output_dir):
@@ -33,9 +33,9 @@ def export_today_csv():
         writer = csv.writer(f)
         writer.writerow(['City', 'RaceNo', 'Distance', 'Surface', 'Horse', 'Jockey'])
         
-        for r in races:
-            for e in r.entries:
-                writer.writerow([r.city, r.race_no, r.distance_m, r.surface, e.horse_name, e.jockey_name])
+        for race in races:
+            for entry in race.entries:
+                writer.writerow([race.city, race.race_no, race.distance_m, race.surface, entry.horse_name, entry.jockey_name])
                 
     print("Export complete.")
 
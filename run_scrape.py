@@ -7,16 +7,17 @@ from datetime import date, timedelta
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
 from tjk.cli import scrape_range_async
-from tjk.storage.db import get_db
+from tjk.storage.db import session_scope
 from sqlalchemy import text
 
 async def main():
     # 1. Determine Start Date (Last recorded date in DB or default)
-    db = next(get_db())
-    try:
-        last_date_str = db.execute(text("SELECT max(date) FROM races")).scalar()
-    except Exception:
-        last_date_str = None
+    # Write engine: the DB file may not exist yet (read-only open would fail)
+    with session_scope() as db:
+        try:
+            last_date_str = db.execute(text("SELECT max(date) FROM races")).scalar()
+        except Exception:
+            last_date_str = None
     
     if last_date_str:
         # Start from the last date found (to verify/update results for that day)
@@ -3,7 +3,7 @@ from datetime import date
 from typing import Dict, List, Any
 from sqlalchemy.orm import Session
 from .profile import HorseProfile
-from tjk.storage.schema import RaceModel
+from tjk.storage.read_repo import RaceReadRepository, RaceRow
 
 class DecisionEngine:
     def __init__(self, db_session: Session, profiles: Dict[str, HorseProfile]):
@@ -11,21 +11,19 @@ class DecisionEngine:
         self.profiles = profiles
         
     def analyze_daily_program(self, target_date: date, cities: List[str]) -> List[Dict[str, Any]]:
-        results = []
-        
-        # Fetch today's races
-        races = self.db.query(RaceModel).filter(
-            RaceModel.date == target_date,
-            RaceModel.city.in_(cities)
-        ).order_by(RaceModel.city, RaceModel.race_no).all()
+        # Fetch today's races (entries loaded in the same query)
+        races = RaceReadRepository(self.db).races_for_day(target_date, cities)
+        return self.analyze_races(races)
         
+    def analyze_races(self, races: List[RaceRow]) -> List[Dict[str, Any]]:
+        results = []
         for race in races:
             race_res = self._analyze_race(race)
             results.extend(race_res)
             
         return results
         
-    def _analyze_race(self, race: RaceModel) -> List[Dict[str, Any]]:
+    def _analyze_race(self, race: RaceRow) -> List[Dict[str, Any]]:
         candidates = []
         
         surface = "SENTETİK" if race.surface and "SENTETİK" in race.surface.upper() else \
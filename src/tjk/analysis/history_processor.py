@@ -1,10 +1,10 @@
 
 from datetime import date
 from typing import Dict
-from sqlalchemy import text
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from .profile import HorseProfile
-from tjk.storage.schema import RaceModel, EntryModel
+from tjk.storage.schema import EntryFactModel
 
 class HistoryProcessor:
     def __init__(self, db_session: Session):
@@ -14,25 +14,21 @@ class HistoryProcessor:
     def build_profiles(self, start_date: date = date(2025, 5, 5), end_date: date = None):
         print(f"Building profiles from history (Starting {start_date} - Ending {end_date})...")
         
-        # 1. Fetch all historical races in chronological order
-        query = self.db.query(RaceModel).options(
-            joinedload(RaceModel.entries)
-        ).filter(
-            RaceModel.date >= start_date
-        )
+        # 1. Fetch all historical entries in chronological order (entry_facts, no join)
+        query = self._facts_query().where(EntryFactModel.race_date >= start_date)
         
         if end_date:
-            query = query.filter(RaceModel.date < end_date)
+            query = query.where(EntryFactModel.race_date < end_date)
             
-        races = query.order_by(RaceModel.date.asc()).all()
-        
         count = 0
-        for race in races:
-            for entry in race.entries:
-                self._process_entry(race, entry)
-            count += 1
-            if count % 50 == 0:
-                print(f"Processed {count} races...", end='\r')
+        current_race = None
+        for row in self.db.execute(query):
+            self._process_entry(row)
+            if row.race_id != current_race:
+                current_race = row.race_id
+                count += 1
+                if count % 50 == 0:
+                    print(f"Processed {count} races...", end='\r')
             
         print(f"Processed {count} races. Profiles built for {len(self.profiles)} horses.")
         return self.profiles
@@ -41,21 +37,23 @@ class HistoryProcessor:
         """
         Incrementally process races for a specific date to update profiles.
         """
-        races = self.db.query(RaceModel).options(
-            joinedload(RaceModel.entries)
-        ).filter(
-            RaceModel.date == target_date
-        ).all()
-        
         updates = 0
-        for race in races:
-            for entry in race.entries:
-                self._process_entry(race, entry)
-                updates += 1
+        for row in self.db.execute(self._facts_query().where(EntryFactModel.race_date == target_date)):
+            self._process_entry(row)
+            updates += 1
         return updates
         
-    def _process_entry(self, race: RaceModel, entry: EntryModel):
-        name = entry.horse_name
+    def _facts_query(self):
+        return select(
+            EntryFactModel.race_id, EntryFactModel.race_date, EntryFactModel.city,
+            EntryFactModel.surface, EntryFactModel.distance_m, EntryFactModel.horse_name,
+            EntryFactModel.rank, EntryFactModel.agf, EntryFactModel.jockey_name,
+        ).order_by(
+            EntryFactModel.race_date, EntryFactModel.city, EntryFactModel.race_no, EntryFactModel.id
+        )
+        
+    def _process_entry(self, row):
+        name = row.horse_name
         if name not in self.profiles:
             self.profiles[name] = HorseProfile(horse_name=name)
             
@@ -65,12 +63,12 @@ class HistoryProcessor:
         # EntryModel.agf is Float or None
         
         profile.update(
-            race_date=race.date,
-            race_city=race.city,
-            surface=race.surface,
-            distance=race.distance_m,
-            rank=entry.rank,
-            agf=entry.agf,
-            jockey=entry.jockey_name
+            race_date=row.race_date,
+            race_city=row.city,
+            surface=row.surface,
+            distance=row.distance_m,
+            rank=row.rank,
+            agf=row.agf,
+            jockey=row.jockey_name
         )
 
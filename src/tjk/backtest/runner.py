@@ -1,20 +1,24 @@
 import pandas as pd
 import os
 from datetime import timedelta
-from tjk.features.builder import build_features_for_dataset
+from tjk.features.builder import build_features_for_dataset, raw_ml_columns
 from tjk.ml.train import (
     train_place_model, train_win_model, train_sp_model, 
-    predict_with_model, FEATURE_COLS
+    predict_with_model, FEATURE_COLS, LABEL_COLS
 )
 from tjk.decision.weighting import calculate_dynamic_score
 from tjk.decision.risk import classify_race_risk
 
 OUTPUT_DIR = "outputs/daily_reports"
 
+# The daily reports keep every raw column (finish_time, saddle_no...): only the
+# computed features are narrowed to FEATURE_COLS, the raw load is not projected
+REPORT_COLS = raw_ml_columns()
+
 def run_daily_backtest(start_date, end_date):
     """
     Walk-forward backtest.
-    1. Load ALL data (to enable history calcs).
+    1. Load all data up to end_date (training + history calcs).
     2. Loop dates [start_date, end_date].
     3. Train on date < current_date.
     4. Predict current_date.
@@ -24,10 +28,9 @@ def run_daily_backtest(start_date, end_date):
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # 1. Build Full Dataset (Features)
-    # We load slightly before start_date to allow history calculation, 
-    # but `load_raw_data` already fetches full DB if args are None.
-    # Let's load everything for simplicity (DB is small).
-    full_df = build_features_for_dataset()
+    # Every race before a test day is training data, so the start stays open;
+    # nothing after end_date is read and only the features used are computed.
+    full_df = build_features_for_dataset(end_date=end_date, columns=list(dict.fromkeys(FEATURE_COLS + LABEL_COLS + REPORT_COLS)))
     
     # Filter for relevant range loop
     # We need a train set (before start) and test set (in range)
@@ -105,23 +108,19 @@ def run_daily_backtest(start_date, end_date):
         
         # --- PHASE 5: RISK SCORING (RACE LEVEL) ---
         race_risks = []
-        # Group by City+RaceNo
-        # Note: 'race_no' is not unique globally, only per city/date. 
-        # Since we are inside a single date loop, (city, race_no) is unique key.
-        
-        grouped = results.groupby(['city', 'race_no'])
-        for name, group in grouped:
+        # Group by race_key (int, unique per date+city+race_no)
+        grouped = results.groupby('race_key')
+        for race_key, group in grouped:
             risk_metrics = classify_race_risk(group, win_col='model_win')
-            # Add keys to merge back
-            risk_metrics['city'] = name[0]
-            risk_metrics['race_no'] = name[1]
+            # Add key to merge back
+            risk_metrics['race_key'] = race_key
             race_risks.append(risk_metrics)
             
         df_risks = pd.DataFrame(race_risks)
         
         # Merge risk metrics back to results (broadcast to all horses in race)
         if not df_risks.empty:
-            results = pd.merge(results, df_risks, on=['city', 'race_no'], how='left')
+            results = pd.merge(results, df_risks, on='race_key', how='left')
         else:
              # Should not happen
             results['race_risk_label'] = 'UNKNOWN'
@@ -129,7 +128,7 @@ def run_daily_backtest(start_date, end_date):
             results['top1_top2_gap'] = 0.0
 
         # Pred Rank (Sort by Dynamic Score)
-        results['pred_rank'] = results.groupby(['city', 'race_no'])['final_score'].rank(method='first', ascending=False)
+        results['pred_rank'] = results.groupby('race_key')['final_score'].rank(method='first', ascending=False)
         
         # Save Daily Report
         report_path = f"{OUTPUT_DIR}/{current_date}.csv"
@@ -0,0 +1,169 @@
+import contextlib
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from tjk.bench.parsers import DEFAULT_CORPUS_DIR, load_corpus, _csv_context
+from tjk.bench.results import OUTPUT_DIR, run_header, save_run
+from tjk.config import settings
+from tjk.parsers.csv_parser import CsvParser
+from tjk.parsers.program_parser import ProgramCsvParser
+from tjk.storage.db import sqlite_file
+from tjk.storage.duck import DuckAnalytics, duckdb
+from tjk.storage.migrate import apply_schema
+from tjk.storage.repo import TJKRepository
+from tjk.storage.warehouse import ParquetWarehouse, raw_columns
+
+# Same SQL on both engines; {facts} is entry_facts (SQLite) or the `facts` view (DuckDB).
+ENGINE_QUERIES = {
+    "raw_scan (load_raw_data)": f"""
+        SELECT {', '.join(raw_columns())} FROM {{facts}}
+        ORDER BY race_date, city, race_no, id
+    """,
+    "jockey_stats (group-by)": """
+        SELECT jockey_name, COUNT(CASE WHEN rank = 1 THEN 1 END), COUNT(*)
+        FROM {facts} GROUP BY jockey_name
+    """,
+    "trainer_wins (filter + group-by)": """
+        SELECT trainer_id, COUNT(*) FROM {facts} WHERE rank = 1 GROUP BY trainer_id
+    """,
+    "horse_last5 (window)": """
+        SELECT horse_name, rank FROM (
+            SELECT horse_name, rank,
+                   ROW_NUMBER() OVER (PARTITION BY horse_name ORDER BY race_date DESC, id DESC) AS rn
+            FROM {facts} WHERE rank IS NOT NULL
+        ) WHERE rn <= 5
+    """,
+    "monthly_report (group-by)": """
+        SELECT city, SUBSTR(CAST(race_date AS VARCHAR), 1, 7) AS ym,
+               COUNT(DISTINCT race_id), COUNT(*), AVG(agf), AVG(CASE WHEN rank = 1 THEN agf END)
+        FROM {facts} GROUP BY city, ym
+    """,
+}
+
+
+def _normalize(rows) -> list:
+    """Engine independent, order independent form of a result (dates as text, floats rounded)."""
+    out = []
+    for row in rows:
+        values = []
+        for v in row:
+            if isinstance(v, (date, datetime)):
+                v = v.isoformat()[:10]
+            elif isinstance(v, float):
+                v = round(v, 6)
+            values.append(v)
+        out.append(tuple(values))
+    return sorted(out, key=repr)
+
+
+def _time(run, iterations: int):
+    rows = run()  # Warm-up (page cache, DuckDB extension/metadata)
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - t0)
+    return min(timings), rows
+
+
+def build_synthetic_db(path: Path, days: int, corpus_dir: Path = DEFAULT_CORPUS_DIR):
+    """
+    Replays the corpus city-day(s) over `days` consecutive dates (program + results),
+    so the benchmark has a realistically shaped store without real data.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        apply_schema(conn)
+    session = sessionmaker(bind=engine)()
+    repo = TJKRepository(session)
+
+    programs = [(_csv_context(p), c) for p, c in load_corpus(corpus_dir, "program_csv", "*.csv")]
+    results = {_csv_context(p)[1]: c for p, c in load_corpus(corpus_dir, "results_csv", "*.csv")}
+
+    start = date(2024, 1, 1)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            for (_, city), content in programs:
+                repo.upsert_program_day(ProgramCsvParser().parse_csv(content, day, city))
+                if city in results:
+                    repo.update_day_results(CsvParser().parse_csv(results[city], day, city))
+    session.close()
+    engine.dispose()
+
+
+def run_engine_benchmarks(db_path=None, synthetic_days: int = 0, iterations: int = 3,
+                          output_dir: str = OUTPUT_DIR) -> dict:
+    """
+    Times ENGINE_QUERIES on SQLite and on DuckDB (SQLite attach and Parquet mirror)
+    and checks that every engine returns the same rows.
+    db_path: SQLite file (default: settings.DB_URL). synthetic_days > 0 builds a
+    temp DB from the corpus instead.
+    """
+    if duckdb is None:
+        print("⚠️ duckdb not installed (pip install duckdb), nothing to compare.")
+        return {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if synthetic_days:
+            db_path = Path(tmp) / "bench.db"
+            print(f"  > Building synthetic DB ({synthetic_days} days)...")
+            build_synthetic_db(db_path, synthetic_days)
+        db_path = Path(db_path) if db_path else sqlite_file(settings.DB_URL)
+
+        # Mirror of this DB in a temp dir, so the user's warehouse is not touched
+        warehouse = ParquetWarehouse(Path(tmp) / "warehouse")
+        source = create_engine(f"sqlite:///{db_path}")
+        with source.connect() as conn:
+            if warehouse.available:
+                warehouse.sync(conn)
+            rows_total = conn.exec_driver_sql("SELECT COUNT(*) FROM entry_facts").scalar()
+        source.dispose()
+        print(f"⏱️ ENGINE BENCHMARK (db: {db_path}, {rows_total} entries, iterations: {iterations})")
+
+        sqlite_con = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+        ducks = {
+            "duckdb_sqlite": DuckAnalytics("sqlite", db_url=f"sqlite:///{db_path}"),
+            "duckdb_parquet": DuckAnalytics("parquet", warehouse=warehouse),
+        }
+        engines = {"sqlite": lambda sql: sqlite_con.execute(sql.format(facts="entry_facts")).fetchall()}
+        for name, duck in ducks.items():
+            try:
+                con = duck.connect()
+            except Exception as e:
+                print(f"  ⚠️ {name} skipped: {str(e).splitlines()[0]}")
+                continue
+            engines[name] = lambda sql, con=con: con.execute(sql.format(facts="facts")).fetchall()
+
+        results = {}
+        try:
+            for query_name, sql in ENGINE_QUERIES.items():
+                results[query_name] = {}
+                reference = None
+                for engine_name, run in engines.items():
+                    best, rows = _time(lambda: run(sql), iterations)
+                    rows = _normalize(rows)
+                    same = reference is None or rows == reference
+                    reference = reference if reference is not None else rows
+                    results[query_name][engine_name] = {
+                        "best_s": round(best, 6), "rows": len(rows), "same_result": same,
+                    }
+                    print(
+                        f"  > {query_name:<34} {engine_name:<15} {best * 1000:>9.1f} ms | "
+                        f"{len(rows):>7} rows | {'same' if same else 'DIFFERENT'}"
+                    )
+        finally:
+            sqlite_con.close()
+            for duck in ducks.values():
+                duck.close()
+
+    run = run_header(db=str(db_path), entries=rows_total, iterations=iterations, queries=results)
+    save_run("engines", run, output_dir)
+    return run
@@ -0,0 +1,130 @@
+import contextlib
+import os
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from tjk.bench.results import OUTPUT_DIR, run_header, save_run
+from tjk.features.history import calculate_history_features_v2
+from tjk.features.parallel import run_families_parallel
+from tjk.features.registry import FAMILIES, resolve
+
+
+def _pandas_history_features(df, lookback_windows=[3, 5, 10]):
+    """Previous calculate_history_features_v2 (records round-trip + groupby.rolling), the reference."""
+    df_work = df.copy()
+    df_work['__orig_index'] = df_work.index
+    df_work = df_work.sort_values(['horse', 'date'], kind='mergesort')
+    df_work['is_win'] = (df_work['rank'] == 1).astype(int)
+    df_work['is_place'] = (df_work['rank'] <= 3).astype(int)
+    df_clean = pd.DataFrame(df_work.to_dict('records'))
+
+    grouped = df_clean.groupby('horse', sort=False)
+    df_clean['prev_rank'] = grouped['rank'].shift(1).values
+    df_clean['prev_win'] = grouped['is_win'].shift(1).values
+    df_clean['prev_place'] = grouped['is_place'].shift(1).values
+
+    features_dict = {}
+    grouped_rolling = df_clean.groupby('horse', sort=False)
+    for n in lookback_windows:
+        for name, col in (('avg_rank', 'prev_rank'), ('win_rate', 'prev_win'), ('place_rate', 'prev_place')):
+            features_dict[f'{name}_last{n}'] = grouped_rolling[col].rolling(n, min_periods=1).mean().values
+
+    features = pd.DataFrame(features_dict, index=df_clean.index)
+    features.index = df_clean['__orig_index'].astype(df.index.dtype)
+    return features.reindex(df.index).fillna(-1)
+
+
+# name -> history implementation
+HISTORY_PATHS = {
+    "pandas_rolling": _pandas_history_features,
+    "numpy_segments": calculate_history_features_v2,
+}
+
+
+def scale_frame(df: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """
+    `factor` copies of the frame with distinct horse names, so every copy is a
+    separate set of careers of the same shape (row count x factor).
+    """
+    copies = [df.assign(horse=df['horse'].astype(str) + (f"#{k}" if k else "")) for k in range(factor)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def worker_counts(cores: int = None) -> List[int]:
+    """Pool sizes timed by bench-features: 2, 4, 8... up to the core count, and the core count itself."""
+    cores = cores or os.cpu_count() or 1
+    counts, n = [], 2
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [max(cores, 2)]
+
+
+def _time_families(df: pd.DataFrame, iterations: int, workers: List[int]) -> dict:
+    """All registered families: one after another in-process vs run_families_parallel with each pool size."""
+    by_family = resolve().by_family
+    paths = {"in_process": lambda: {f: FAMILIES[f].func(df, columns=names) for f, names in by_family.items()}}
+    for n in workers:
+        paths[f"pool_{n}"] = lambda n=n: run_families_parallel(df, by_family, n)
+    results, reference = {}, None
+    for name, run in paths.items():
+        timings = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            frames = run()
+            timings.append(time.perf_counter() - t0)
+        same = reference is None or all(frames[f].equals(reference[f]) for f in by_family)
+        reference = frames if reference is None else reference
+        best = min(timings)
+        results[name] = {"best_s": round(best, 6), "rows_per_s": round(len(df) / best), "same_result": same}
+        print(f"  > families {name:<15} {best * 1000:>9.1f} ms | {len(df) / best:>12,.0f} rows/s | "
+              f"{'same' if same else 'DIFFERENT'}")
+    print(f"  > Cores: {os.cpu_count()}")
+    return results
+
+
+def run_feature_benchmarks(scale: int = 10, iterations: int = 3, output_dir: str = OUTPUT_DIR,
+                           workers: List[int] = None) -> dict:
+    """
+    Times the history feature implementations on the normalized dataset
+    (build_features_for_dataset input) scaled `scale` times, and checks both
+    return the same frame. Then every family in-process vs the process pool
+    at each size in `workers` (defaults to worker_counts()).
+    """
+    from tjk.features.builder import load_normalized_data
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        base = load_normalized_data()
+    df = scale_frame(base, scale)
+    print(f"⏱️ FEATURE BENCHMARK ({len(base)} rows x {scale} = {len(df)} rows, iterations: {iterations})")
+
+    results, reference = {}, None
+    for name, func in HISTORY_PATHS.items():
+        timings = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            features = func(df)
+            timings.append(time.perf_counter() - t0)
+        same = reference is None or (
+            features.columns.equals(reference.columns)
+            and np.array_equal(features.values, reference.values)
+        )
+        reference = features if reference is None else reference
+        best = min(timings)
+        results[name] = {"best_s": round(best, 6), "rows_per_s": round(len(df) / best), "same_result": same}
+        print(f"  > history {name:<16} {best * 1000:>9.1f} ms | {len(df) / best:>12,.0f} rows/s | "
+              f"{'same' if same else 'DIFFERENT'}")
+
+    slow, fast = (results[n]["best_s"] for n in HISTORY_PATHS)
+    print(f"  > Speedup: {slow / fast:.1f}x")
+
+    workers = workers or worker_counts()
+    families = _time_families(df, iterations, workers)
+
+    run = run_header(rows=len(df), scale=scale, iterations=iterations, cores=os.cpu_count(),
+                     history=results, families=families)
+    save_run("features", run, output_dir)
+    return run
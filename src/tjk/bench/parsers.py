@@ -0,0 +1,164 @@
+import contextlib
+import os
+import re
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from tjk.parsers.csv_parser import CsvParser
+from tjk.parsers.program_parser import ProgramParser, ProgramCsvParser
+from tjk.parsers.race_parser import RaceParser
+from tjk.bench.results import OUTPUT_DIR, run_header, save_run
+
+# Checked-in synthetic corpus (one small city-day). Real runs should point
+# --corpus at a directory of recorded TJK files with the same layout:
+#   program_csv/   GunlukYarisProgrami CSVs   -> ProgramCsvParser.parse_csv
+#   results_csv/   GunlukYarisSonuclari CSVs  -> CsvParser.parse_csv
+#   program_html/  daily program pages        -> ProgramParser.parse_cities
+#   race_html/     race detail pages          -> RaceParser.parse_race_detail
+DEFAULT_CORPUS_DIR = Path(__file__).parent / "corpus"
+
+# "20.12.2025-Adana-GunlukYarisProgrami-TR.csv" / "2025-12-20_Adana_1.html"
+TJK_CSV_NAME = re.compile(r"^(\d{2})\.(\d{2})\.(\d{4})-(.+?)-GunlukYaris")
+RACE_HTML_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2})_(.+)_(\d+)$")
+
+
+def _csv_context(path: Path) -> Tuple[date, str]:
+    """Recovers (date, city) from a TJK CSV file name, with a neutral fallback."""
+    m = TJK_CSV_NAME.match(path.name)
+    if not m:
+        return date.today(), path.stem
+    day, month, year, city = m.groups()
+    return date(int(year), int(month), int(day)), city
+
+
+def _race_stub(path: Path) -> dict:
+    m = RACE_HTML_NAME.match(path.stem)
+    if not m:
+        return {'race_id': path.stem, 'date': date.today(), 'city': "Bench", 'race_no': 1}
+    race_date, city, race_no = m.groups()
+    return {
+        'race_id': path.stem,
+        'date': date.fromisoformat(race_date),
+        'city': city,
+        'race_no': int(race_no),
+    }
+
+
+def _run_program_csv(path: Path, content: str) -> int:
+    race_date, city = _csv_context(path)
+    races = ProgramCsvParser().parse_csv(content, race_date, city)
+    return sum(len(r.entries) for r in races)
+
+
+def _run_results_csv(path: Path, content: str) -> int:
+    race_date, city = _csv_context(path)
+    races = CsvParser().parse_csv(content, race_date, city)
+    return sum(len(r.entries) for r in races)
+
+
+def _run_program_html(path: Path, content: str) -> int:
+    return len(ProgramParser().parse_cities(content))
+
+
+def _run_race_html(path: Path, content: str) -> int:
+    race = RaceParser().parse_race_detail(content, _race_stub(path))
+    return len(race.entries)
+
+
+# name -> (corpus sub directory, glob, runner). Runner returns parsed rows.
+PARSER_SUITE: Dict[str, Tuple[str, str, Callable[[Path, str], int]]] = {
+    "ProgramCsvParser.parse_csv": ("program_csv", "*.csv", _run_program_csv),
+    "CsvParser.parse_csv": ("results_csv", "*.csv", _run_results_csv),
+    "ProgramParser.parse_cities": ("program_html", "*.html", _run_program_html),
+    "RaceParser.parse_race_detail": ("race_html", "*.html", _run_race_html),
+}
+
+
+def load_corpus(corpus_dir: Path, subdir: str, pattern: str) -> List[Tuple[Path, str]]:
+    """Reads every file of one parser family into memory (I/O is not measured)."""
+    files = sorted((corpus_dir / subdir).glob(pattern))
+    return [(f, f.read_text(encoding="utf-8")) for f in files]
+
+
+def _one_pass(runner, files) -> int:
+    rows = 0
+    for path, content in files:
+        rows += runner(path, content)
+    return rows
+
+
+def bench_parser(runner, files, iterations: int = 5) -> dict:
+    """
+    Times `iterations` passes over `files`, then one traced pass for memory.
+    Timing and tracing are separate because tracemalloc slows allocation heavy code.
+    Parser console output is discarded so terminal speed does not skew results.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        # Warm-up (imports, regex compilation, selectolax/bs4 init)
+        rows = _one_pass(runner, files)
+
+        timings = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            _one_pass(runner, files)
+            timings.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            _one_pass(runner, files)
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+    diff = after.compare_to(before, 'filename')
+    alloc_blocks = sum(max(s.count_diff, 0) for s in diff)
+    alloc_bytes = sum(max(s.size_diff, 0) for s in diff)
+
+    best = min(timings)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    return {
+        "files": len(files),
+        "rows": rows,
+        "iterations": iterations,
+        "best_s": round(best, 6),
+        "median_s": round(median, 6),
+        "rows_per_sec": round(rows / best, 1) if best > 0 else None,
+        "alloc_blocks": alloc_blocks,
+        "alloc_kib": round(alloc_bytes / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_parser_benchmarks(corpus_dir=None, iterations: int = 5, output_dir: str = OUTPUT_DIR) -> dict:
+    """
+    Runs every parser in PARSER_SUITE over the corpus and writes the results:
+    - {output_dir}/parsers_<timestamp>.json  (this run)
+    - {output_dir}/parsers_history.jsonl     (one line per run, for trend comparison)
+    Parsers with no files in the corpus are skipped.
+    """
+    corpus_dir = Path(corpus_dir) if corpus_dir else DEFAULT_CORPUS_DIR
+    print(f"⏱️ PARSER BENCHMARK (corpus: {corpus_dir}, iterations: {iterations})")
+
+    results = {}
+    for name, (subdir, pattern, runner) in PARSER_SUITE.items():
+        files = load_corpus(corpus_dir, subdir, pattern)
+        if not files:
+            print(f"  ⚠️ {name}: no files in {subdir}/, skipped.")
+            continue
+        res = bench_parser(runner, files, iterations)
+        results[name] = res
+        print(
+            f"  > {name:<30} {res['rows']:>6} rows | {res['rows_per_sec'] or 0:>10.0f} rows/s | "
+            f"{res['alloc_blocks']:>7} blocks | peak {res['peak_kib']:>8.1f} KiB"
+        )
+
+    run = run_header(corpus=str(corpus_dir), iterations=iterations, parsers=results)
+    save_run("parsers", run, output_dir)
+    return run
@@ -0,0 +1,44 @@
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+from typing import Optional
+
+OUTPUT_DIR = "outputs/bench"
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_header(**extra) -> dict:
+    """Common metadata so runs from different commits/machines can be compared."""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        **extra,
+    }
+
+
+def save_run(kind: str, run: dict, output_dir: str = OUTPUT_DIR):
+    """
+    Writes one benchmark run:
+    - {output_dir}/{kind}_<timestamp>.json  (this run)
+    - {output_dir}/{kind}_history.jsonl     (one line per run, for trend comparison)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    with open(f"{output_dir}/{kind}_{stamp}.json", "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=4, ensure_ascii=False, default=str)
+    with open(f"{output_dir}/{kind}_history.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False, default=str) + "\n")
+    print(f"✅ Results saved to {output_dir}/")
@@ -0,0 +1,210 @@
+import contextlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from tjk.bench.parsers import DEFAULT_CORPUS_DIR, load_corpus, _csv_context
+from tjk.bench.results import OUTPUT_DIR, run_header, save_run
+from tjk.parsers.program_parser import ProgramCsvParser
+from tjk.models.horse import HorseProfile
+from tjk.storage.db import Base
+from tjk.storage.dimensions import race_key
+from tjk.storage.repo import TJKRepository, birth_year_from_age
+from tjk.storage.schema import EntryModel, RaceModel
+from tjk.storage import facts
+from tjk.storage.horse_cache import HorseCache
+from tjk.storage import schema  # noqa: F401  (registers models on Base)
+
+
+class CommitCounter:
+    """Counts COMMITs issued on an engine (ConnectionEvents.commit)."""
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_commit(self, conn):
+        self.count += 1
+
+
+def _legacy_upsert(repo: TJKRepository, races):
+    """Previous upsert_program_race (delete + re-insert + a commit per horse), the reference."""
+    db = repo.db
+    for race in races:
+        existing_race = db.query(RaceModel).filter(RaceModel.race_id == race.race_id).first()
+        if existing_race:
+            db.delete(existing_race)
+            db.commit()
+
+        city_key = repo.keys.key(db, 'city', race.city)
+        db_race = RaceModel(
+            race_id=race.race_id,
+            date=race.date,
+            city=race.city,
+            race_no=race.race_no,
+            distance_m=race.distance_m,
+            surface=race.surface.value,
+            city_key=city_key,
+            race_key=race_key(race.date, city_key, race.race_no)
+        )
+        db.add(db_race)
+        db.commit()
+
+        for entry in race.entries:
+            temp_info = getattr(entry, '_temp_horse_info', {})
+            repo.upsert_horse(HorseProfile(
+                horse_id=entry.horse_id,
+                name=entry.horse_name,
+                sire=temp_info.get('sire'),
+                dam=temp_info.get('dam'),
+                birth_year=birth_year_from_age(temp_info.get('age_text'), race.date),
+            ))
+            db.add(EntryModel(
+                race_id=race.race_id,
+                horse_id=entry.horse_id,
+                horse_name=entry.horse_name,
+                saddle_no=entry.saddle_no,
+                jockey_name=entry.jockey_name,
+                weight_kg=entry.weight_kg,
+                owner_id=entry.owner_id,
+                trainer_id=entry.trainer_id,
+                hp=entry.hp,
+                kgs=entry.kgs,
+                s20=entry.s20,
+                agf=entry.agf,
+                form_score=entry.form_score,
+                equipment=entry.equipment,
+                horse_key=repo.keys.key(db, 'horse', entry.horse_id),
+                jockey_key=repo.keys.key(db, 'jockey', entry.jockey_name),
+                trainer_key=repo.keys.key(db, 'trainer', entry.trainer_id),
+                owner_key=repo.keys.key(db, 'owner', entry.owner_id),
+                race_key=db_race.race_key
+            ))
+        db.flush()
+        facts.refresh_races(db, [race.race_id])
+        db.commit()
+    return {
+        'races': len(races),
+        'entries': sum(len(r.entries) for r in races),
+        'horses': sum(len(r.entries) for r in races),
+    }
+
+
+def _per_race_upsert(repo: TJKRepository, races):
+    counts = [repo.upsert_program_race(race) for race in races]
+    return {k: sum(c[k] for c in counts) for k in ('races', 'entries', 'horses')}
+
+
+def _bulk_upsert(repo: TJKRepository, races):
+    return repo.upsert_program_day(races)
+
+
+# name -> (how one parsed city-day is written, use a preloaded HorseCache)
+UPSERT_PATHS = {
+    "legacy": (_legacy_upsert, False),
+    "per_race": (_per_race_upsert, False),
+    "bulk": (_bulk_upsert, False),
+    "cached": (_bulk_upsert, True),
+}
+
+
+def _table_state(session) -> dict:
+    """
+    Order-independent dump used to check every path ends in the same DB state
+    (content_hash is left out: the legacy path predates it).
+    """
+    state = {}
+    for table, cols in [
+        ("races", "race_id, date, city, race_no, distance_m, surface"),
+        ("entries", "race_id, horse_id, horse_name, saddle_no, jockey_name, weight_kg, owner_id, "
+                    "trainer_id, hp, kgs, s20, agf, form_score, rank, finish_time, ganyan, equipment"),
+        ("horses", "horse_id, name, gender, sire, dam, birth_year"),
+        ("entry_facts", "race_id, race_date, city, race_no, field_size, horse_id, rank, finish_s, ganyan_odds"),
+    ]:
+        rows = session.execute(text(f"SELECT {cols} FROM {table}")).fetchall()
+        state[table] = sorted(tuple(str(v) for v in r) for r in rows)
+    return state
+
+
+def bench_upsert_path(upsert: Callable, days: List[tuple], passes: int = 2, use_cache: bool = False):
+    """
+    Writes every parsed city-day into a fresh temp SQLite DB with `upsert`.
+    Pass 1 is a cold load, later passes are re-scrapes of the same days.
+    Returns (per-day stats, final table state).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        counter = CommitCounter(engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        repo = TJKRepository(session, horse_cache=HorseCache().preload(session) if use_cache else None)
+
+        stats = []
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                for pass_no in range(1, passes + 1):
+                    for label, races in days:
+                        commits_before = counter.count
+                        t0 = time.perf_counter()
+                        counts = upsert(repo, races)
+                        elapsed = time.perf_counter() - t0
+                        stats.append({
+                            "day": label,
+                            "pass": pass_no,
+                            "races": len(races),
+                            "entries": sum(len(r.entries) for r in races),
+                            "races_written": counts['races'],
+                            "entries_written": counts['entries'],
+                            "horse_writes": counts['horses'],
+                            "commits": counter.count - commits_before,
+                            "seconds": round(elapsed, 6),
+                        })
+            state = _table_state(session)
+        finally:
+            session.close()
+            engine.dispose()
+    return stats, state
+
+
+def run_storage_benchmarks(corpus_dir=None, passes: int = 2, output_dir: str = OUTPUT_DIR) -> dict:
+    """
+    Compares the previous program upsert (legacy: delete + re-insert, a commit
+    per horse) with the current per-race and single-transaction city-day paths
+    (with and without the known-horse cache): horse writes, commits and elapsed
+    time per day, cold load and re-scrape.
+    """
+    corpus_dir = Path(corpus_dir) if corpus_dir else DEFAULT_CORPUS_DIR
+    print(f"⏱️ STORAGE BENCHMARK (corpus: {corpus_dir}, passes: {passes})")
+
+    days = []
+    for path, content in load_corpus(corpus_dir, "program_csv", "*.csv"):
+        race_date, city = _csv_context(path)
+        races = ProgramCsvParser().parse_csv(content, race_date, city)
+        days.append((f"{race_date}_{city}", races))
+
+    if not days:
+        print("  ⚠️ No program CSVs in corpus.")
+        return {}
+
+    results = {}
+    states = {}
+    for name, (upsert, use_cache) in UPSERT_PATHS.items():
+        stats, states[name] = bench_upsert_path(upsert, days, passes, use_cache)
+        results[name] = stats
+        for s in stats:
+            print(
+                f"  > {name:<8} pass {s['pass']} {s['day']:<24} {s['entries']:>4} entries | "
+                f"{s['entries_written']:>4} entry writes | {s['horse_writes']:>4} horse writes | "
+                f"{s['commits']:>5} commits | {s['seconds'] * 1000:>8.1f} ms"
+            )
+
+    same_state = len({repr(s) for s in states.values()}) == 1
+    print(f"  > Same final DB state across paths: {'YES' if same_state else 'NO'}")
+
+    run = run_header(corpus=str(corpus_dir), passes=passes, same_state=same_state, paths=results)
+    save_run("storage", run, output_dir)
+    return run
@@ -1,16 +1,21 @@
 import typer
 import asyncio
+import time
+from typing import List, Optional
 from datetime import date, timedelta
 from .http.client import TJKClient
 from .parsers.program_parser import ProgramParser, ProgramCsvParser
 from .parsers.csv_parser import CsvParser
-from .storage.db import init_db, get_db
+from .storage.db import init_db, read_session, session_scope
 from .storage.repo import TJKRepository
+from .storage.horse_cache import HorseCache
+from .storage.warehouse import sync_warehouse
 from .config import settings
+from .utils.debug import debug_capture
 
 app = typer.Typer()
 
-async def process_city_dual_source(client, target_date: date, city: str):
+async def process_city_dual_source(client, target_date: date, city: str, horse_cache: HorseCache = None):
     """
     Two-phase scraping:
     1. Fetch 'GunlukYarisProgrami' -> Upsert Race/Entries (with AGF, Form, etc.)
@@ -32,48 +37,50 @@ async def process_city_dual_source(client, target_date: date, city: str):
     date_file = target_date.strftime('%d.%m.%Y')
     year = target_date.year
     
-    db = next(get_db())
-    repo = TJKRepository(db)
+    # One pooled connection per city, returned when the city is done
+    with session_scope() as db:
+        repo = TJKRepository(db, horse_cache=horse_cache)
     
-    # --- PHASE 1: PROGRAM ---
-    prog_url = f"https://medya-cdn.tjk.org/raporftp/TJKPDF/{year}/{date_path}/CSV/GunlukYarisProgrami/{date_file}-{normalized_city}-GunlukYarisProgrami-TR.csv"
-    try:
-        content = await client.get(prog_url)
-        parser = ProgramCsvParser()
-        races = parser.parse_csv(content, target_date, normalized_city)
-        if races:
-            for race in races:
-                repo.upsert_program_race(race)
-            print(f"  [Program] {city}: {len(races)} races upserted.")
-        else:
-            print(f"  [Program] {city}: Parsed 0 races.")
-    except Exception as e:
-        print(f"  [Program] {city}: CSV not found/Failed ({e})")
-        # Proceed to Results? If Program fails, we can't update results reliably if entries aren't created.
-        # But maybe 'upsert_program_race' handles skeleton creation.
-        # If Program fails, we skip Results because we rely on existing entries for ID matching?
-        # Or we could let Results create entries if missing?
-        # My current 'update_race_results' only updates. So we skip.
-        # However, for old dates or foreign races, maybe Program CSV is missing but Results exists?
-        # TJK usually has both or neither.
-        pass
-
-    # --- PHASE 2: RESULTS ---
-    res_url = f"https://medya-cdn.tjk.org/raporftp/TJKPDF/{year}/{date_path}/CSV/GunlukYarisSonuclari/{date_file}-{normalized_city}-GunlukYarisSonuclari-TR.csv"
-    try:
-        content = await client.get(res_url)
-        parser = CsvParser()
-        races_res = parser.parse_csv(content, target_date, normalized_city)
-        if races_res:
-            count = 0
-            for race in races_res:
-                repo.update_race_results(race)
-                count += len(race.entries)
-            print(f"  [Results] {city}: Updated {count} entries.")
-        else:
-            print(f"  [Results] {city}: Parsed 0 races.")
-    except Exception as e:
-        print(f"  [Results] {city}: CSV not found/Failed ({e})")
+        # --- PHASE 1: PROGRAM ---
+        prog_url = f"https://medya-cdn.tjk.org/raporftp/TJKPDF/{year}/{date_path}/CSV/GunlukYarisProgrami/{date_file}-{normalized_city}-GunlukYarisProgrami-TR.csv"
+        try:
+            content = await client.get(prog_url)
+            parser = ProgramCsvParser()
+            races = parser.parse_csv(content, target_date, normalized_city)
+            debug_capture.capture("program_csv", f"{date_file}-{normalized_city}", content, failure=not races, ext=".csv")
+            if races:
+                t0 = time.perf_counter()
+                counts = repo.upsert_program_day(races)
+                print(f"  [Program] {city}: {counts['races']} races / {counts['entries']} entries written, "
+                      f"{counts['unchanged']} races unchanged, {counts['horses']} horse writes "
+                      f"({time.perf_counter() - t0:.2f}s).")
+            else:
+                print(f"  [Program] {city}: Parsed 0 races.")
+        except Exception as e:
+            print(f"  [Program] {city}: CSV not found/Failed ({e})")
+            # Proceed to Results? If Program fails, we can't update results reliably if entries aren't created.
+            # But maybe 'upsert_program_race' handles skeleton creation.
+            # If Program fails, we skip Results because we rely on existing entries for ID matching?
+            # Or we could let Results create entries if missing?
+            # My current 'update_race_results' only updates. So we skip.
+            # However, for old dates or foreign races, maybe Program CSV is missing but Results exists?
+            # TJK usually has both or neither.
+            pass
+
+        # --- PHASE 2: RESULTS ---
+        res_url = f"https://medya-cdn.tjk.org/raporftp/TJKPDF/{year}/{date_path}/CSV/GunlukYarisSonuclari/{date_file}-{normalized_city}-GunlukYarisSonuclari-TR.csv"
+        try:
+            content = await client.get(res_url)
+            parser = CsvParser()
+            races_res = parser.parse_csv(content, target_date, normalized_city)
+            debug_capture.capture("results_csv", f"{date_file}-{normalized_city}", content, failure=not races_res, ext=".csv")
+            if races_res:
+                counts = repo.update_day_results(races_res)
+                print(f"  [Results] {city}: Updated {counts['updated']} entries.")
+            else:
+                print(f"  [Results] {city}: Parsed 0 races.")
+        except Exception as e:
+            print(f"  [Results] {city}: CSV not found/Failed ({e})")
 
 async def scrape_range_async(start_date: date, end_date: date):
     print(f"Scraping range: {start_date} to {end_date}")
@@ -81,6 +88,10 @@ async def scrape_range_async(start_date: date, end_date: date):
     client = TJKClient()
     program_parser = ProgramParser() 
     
+    # Known horses, loaded once: re-scraped days then write (almost) no horse rows
+    with read_session() as db:
+        horse_cache = HorseCache().preload(db)
+    
     current_date = start_date
     while current_date <= end_date:
         print(f"\nProcessing {current_date}...")
@@ -98,7 +109,7 @@ async def scrape_range_async(start_date: date, end_date: date):
                 
                 for city_info in cities:
                     city_name = city_info['name'].split('(')[0].strip()
-                    await process_city_dual_source(client, current_date, city_name)
+                    await process_city_dual_source(client, current_date, city_name, horse_cache)
                     
         except Exception as e:
             print(f"Error processing {current_date}: {e}")
@@ -107,6 +118,64 @@ async def scrape_range_async(start_date: date, end_date: date):
         await asyncio.sleep(1)
         
     await client.close()
+    
+    # Rewrite only the warehouse months this run changed
+    sync_warehouse()
+    # Then the feature months (reads the fresh mirror)
+    from .features.store import sync_feature_store
+    sync_feature_store()
+
+@app.command()
+def migrate():
+    """
+    Upgrades an existing DB: missing tables/columns/indexes + ANALYZE, prints query plans.
+    """
+    from tjk.storage.migrate import run_migrations
+    run_migrations()
+
+@app.command()
+def warehouse_sync(full: bool = typer.Option(False, help="Rewrite every month, not only changed ones")):
+    """
+    Brings the Parquet mirror (races JOIN entries, one file per month) up to date.
+    """
+    sync_warehouse(full=full)
+
+@app.command()
+def feature_store(rebuild: bool = typer.Option(False, help="Drop stored features and recompute everything")):
+    """
+    Brings the persisted feature store up to date (only changed months are computed).
+    """
+    import shutil
+    from tjk.features.store import sync_feature_store
+    if rebuild:
+        shutil.rmtree(settings.FEATURE_STORE_DIR, ignore_errors=True)
+    sync_feature_store()
+
+@app.command()
+def feature_cache(clear: bool = typer.Option(False, help="Delete every cached feature matrix")):
+    """
+    Shows (or clears) the on-disk cache of built feature matrices.
+    """
+    from tjk.features.cache import FeatureCache
+    cache = FeatureCache()
+    if clear:
+        print(f"🧹 Feature cache: {cache.clear()} entr(ies) removed.")
+    s = cache.stats()
+    print(f"♻️ Feature cache: {s['entries']} entr(ies), {s['bytes'] / 1e6:.1f} / {s['max_bytes'] / 1e6:.0f} MB.")
+
+@app.command()
+def refresh_facts(
+    start: str = typer.Option(None, help="Start date YYYY-MM-DD (default: all)"),
+    end: str = typer.Option(None, help="End date YYYY-MM-DD (default: all)")
+):
+    """
+    Rebuilds entry_facts for a date range (scrapes keep it current on their own).
+    """
+    from tjk.storage.facts import rebuild
+    init_db()
+    with session_scope() as db:
+        rows = rebuild(db, start, end)
+    print(f"✅ entry_facts rebuilt ({start or 'start'} to {end or 'end'}), {rows} rows total.")
 
 @app.command()
 def inspect_db():
@@ -133,6 +202,57 @@ def predict_day(date: str):
     e = date.fromisoformat(end)
     asyncio.run(scrape_range_async(s, e))
 
+@app.command()
+def bench_parsers(
+    corpus: str = typer.Option(None, help="Directory of recorded TJK files (defaults to the bundled synthetic corpus)"),
+    iterations: int = typer.Option(5, help="Timed passes per parser"),
+    out: str = typer.Option("outputs/bench", help="Output directory for JSON results"),
+):
+    """
+    Parser throughput benchmark (rows/s, allocations, peak memory).
+    """
+    from tjk.bench.parsers import run_parser_benchmarks
+    run_parser_benchmarks(corpus, iterations, out)
+
+@app.command()
+def bench_storage(
+    corpus: str = typer.Option(None, help="Directory of recorded TJK files (defaults to the bundled synthetic corpus)"),
+    passes: int = typer.Option(2, help="Load passes per day (pass 2+ = re-scrape)"),
+    out: str = typer.Option("outputs/bench", help="Output directory for JSON results"),
+):
+    """
+    Program upsert benchmark: commits and elapsed time per day, legacy vs per-race vs bulk path.
+    """
+    from tjk.bench.storage import run_storage_benchmarks
+    run_storage_benchmarks(corpus, passes, out)
+
+@app.command()
+def bench_engines(
+    db: str = typer.Option(None, help="SQLite file to query (defaults to DB_URL)"),
+    synthetic_days: int = typer.Option(0, help="Build a temp DB replaying the corpus over N days instead"),
+    iterations: int = typer.Option(3, help="Timed iterations per query (best is reported)"),
+    out: str = typer.Option("outputs/bench", help="Output directory for JSON results"),
+):
+    """
+    Analytic query benchmark: SQLite vs DuckDB (SQLite attach / Parquet mirror), same queries.
+    """
+    from tjk.bench.engines import run_engine_benchmarks
+    run_engine_benchmarks(db, synthetic_days, iterations, out)
+
+@app.command()
+def bench_features(
+    scale: int = typer.Option(10, help="Copies of the dataset to time (distinct horses per copy)"),
+    iterations: int = typer.Option(3, help="Timed iterations per implementation (best is reported)"),
+    out: str = typer.Option("outputs/bench", help="Output directory for JSON results"),
+    workers: Optional[List[int]] = typer.Option(None, help="Pool sizes to time (repeatable; defaults to 2, 4... up to the core count)"),
+):
+    """
+    Feature benchmark: history (pandas groupby.rolling vs NumPy segment kernels) and
+    all families in-process vs the process pool at each pool size, same output.
+    """
+    from tjk.bench.features import run_feature_benchmarks
+    run_feature_benchmarks(scale, iterations, out, workers)
+
 @app.command()
 def evaluate():
     """
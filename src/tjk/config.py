@@ -22,9 +22,51 @@ class Settings(BaseSettings):
     # This is fine for now on this specific machine.
     DB_URL: str = r"sqlite:///C:\Users\Ali\Desktop\tjk\tjk_v2\tjk.db"
     
+    # SQLite PRAGMA profile (see tjk.storage.db.SQLITE_PROFILES): default | balanced | bulk
+    DB_PROFILE: str = "balanced"
+    
+    # Connection pool per engine (write + read-only), see tjk.storage.db.pool_options
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 30  # s to wait for a free connection before failing
+    
     CACHE_DIR: Path = APP_DIR / "cache"
     SNAPSHOT_DIR: Path = APP_DIR / "snapshots"
     
+    # Parquet mirror of races JOIN entries (tjk.storage.warehouse), needs pyarrow
+    WAREHOUSE_ENABLED: bool = True
+    WAREHOUSE_DIR: Path = APP_DIR / "warehouse"
+    
+    # Persisted per-month feature rows + resume state (tjk.features.store), needs pyarrow
+    FEATURE_STORE_ENABLED: bool = True
+    FEATURE_STORE_DIR: Path = APP_DIR / "features"
+    
+    # Memo of build_features_for_dataset outputs (tjk.features.cache), LRU-evicted past the size cap
+    FEATURE_CACHE_ENABLED: bool = True
+    FEATURE_CACHE_DIR: Path = APP_DIR / "feature_cache"
+    FEATURE_CACHE_MAX_MB: int = 512
+    
+    # Process pool for the feature families (tjk.features.parallel): 0 = one worker per core,
+    # 1 = in-process. Smaller frames run in-process (the pool start-up would dominate).
+    # Off by default: `tjk bench-features` has not shown the pool beating in-process yet,
+    # set both from its numbers on the target host before turning it on.
+    FEATURE_WORKERS: int = 1
+    FEATURE_PARALLEL_MIN_ROWS: int = 1000000
+    
+    # Engine for analytic reads (load_raw_data, predict_advanced aggregates):
+    # sqlite | duckdb (needs duckdb, falls back to sqlite when unavailable)
+    ANALYTICS_ENGINE: str = "sqlite"
+    
+    # Rows per chunk streamed by load_raw_data (each chunk is typed before the next one is read)
+    LOADER_CHUNK_ROWS: int = 50000
+    
+    # Debug capture (see tjk.utils.debug): off | failures | sampled | verbose
+    # The directory is only created when an artifact is actually written.
+    DEBUG_LEVEL: str = "off"
+    DEBUG_SAMPLE_RATE: float = 0.01
+    DEBUG_DIR: Path = APP_DIR / "debug"
+    DEBUG_MAX_ARTIFACTS: int = 200
+    
     class Config:
         env_file = ".env"
 
@@ -5,16 +5,27 @@ import pandas as pd
 import asyncio
 from typing import List, Dict, Any
 
-from tjk.storage.db import get_db
-from tjk.storage.schema import RaceModel
+from tjk.storage.db import ReadSessionLocal
+from tjk.storage.read_repo import RaceReadRepository
 from tjk.analysis.history_processor import HistoryProcessor
 from tjk.analysis.decision_engine import DecisionEngine
 from tjk.analysis.calibrator import ScoreCalibrator
 from tjk.cli import scrape_range_async
 
 class CouponGenerator:
+    """
+    Long-lived (the GUI keeps one for the whole app): a single read-only
+    session, closed after every request. Closing hands the connection back
+    to the pool, so the next request reuses the same warm SQLite connection
+    (page cache, mmap) but never sees objects cached by the previous one.
+    """
     def __init__(self):
-        self.db = next(get_db())
+        # Read-only: scraping writes through its own sessions
+        self.db = ReadSessionLocal()
+        self.read_repo = RaceReadRepository(self.db)
+
+    def close(self):
+        self.db.close()
 
     async def ensure_data(self, target_date: datetime.date, city: str):
         """Force scrape for target date. No caching for today."""
@@ -23,6 +34,12 @@ class CouponGenerator:
         await scrape_range_async(target_date, target_date)
 
     def process(self, city: str, target_date: datetime.date = None):
+        try:
+            return self._process(city, target_date)
+        finally:
+            self.db.close()
+
+    def _process(self, city: str, target_date: datetime.date = None):
         # 1. TARGET DATE = BUGÜN (Strict Rule)
         if target_date is None:
             target_date = datetime.date.today()
@@ -46,10 +63,7 @@ class CouponGenerator:
         
         # Check DB State NOW
         # We need to verify we actually HAVE data for (City, Date)
-        official_races_check = self.db.query(RaceModel).filter(
-            RaceModel.date == target_date,
-            RaceModel.city == city # Case sensitive usually, but DB depends.
-        ).all()
+        official_races_check = self.read_repo.races_for_day(target_date, [city]) # Case sensitive usually, but DB depends.
         
         if not official_races_check:
             return {"error": f"⛔ BUGÜN PROGRAM YAYINLANMADI / SCRAPE FAIL\n({city} - {target_date} için veri yok)"}
@@ -134,11 +148,7 @@ class CouponGenerator:
             available_races = seq['races']
             
             # Validation Logic (Official Check)
-            official_races = self.db.query(RaceModel).filter(
-                RaceModel.date == target_date,
-                RaceModel.city == db_city, # Use verified db_city
-                RaceModel.race_no.in_(available_races)
-            ).all()
+            official_races = self.read_repo.races_for_day(target_date, [db_city], available_races) # Use verified db_city
             
             official_map = {r.race_no: [e.horse_name for e in r.entries] for r in official_races}
             
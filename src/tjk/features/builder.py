@@ -1,67 +1,145 @@
 
 import pandas as pd
-from tjk.ml.dataset import load_raw_data, COLUMN_MAPPING
-from tjk.features.history import calculate_history_features_v2
-
-from tjk.features.specialization import calculate_specialization_features_v2
-from tjk.features.relative import calculate_relative_features
+from tjk.config import settings
+from tjk.ml.dataset import iter_raw_data, COLUMN_MAPPING
+from tjk.features.cache import FeatureCache
+from tjk.features.dtypes import apply_dtype_policy, frame_memory_mb, memory_report
+from tjk.features.parallel import family_parts, feature_workers, run_families_parallel
+from tjk.features.registry import FAMILIES, family_inputs, resolve
+from tjk.features.store import FeatureStore
+from tjk.storage.db import read_session
+from tjk.storage.warehouse import raw_columns
+from tjk.utils.debug import debug_capture
 # from tjk.features.surprise import calculate_surprise_features
 
-def build_features_for_dataset(start_date=None, end_date=None):
+# ML column name -> DB column name (load_raw_data projection)
+RAW_NAMES = {v: k for k, v in COLUMN_MAPPING.items()}
+
+# Loaded with every projection: row / race keys and the race order
+KEY_COLUMNS = ['id', 'date', 'city', 'race_no', 'race_key']
+
+def raw_ml_columns():
+    """ML names of every raw column (what load_normalized_data returns unprojected)."""
+    return [COLUMN_MAPPING.get(c, c) for c in raw_columns()]
+
+def load_normalized_data(start_date=None, end_date=None, columns=None, lookback=0):
     """
-    Main pipeline to load DB data and generate ALL features.
+    Raw rows (load_raw_data) with ML column names and a datetime `date`.
+    columns: ML names to load (default: every raw column); lookback: earlier
+    races of the horses in the range, see load_raw_data.
     """
-    # 1. Load Raw Data
-    df = load_raw_data(start_date, end_date)
-    
+    # 1. Load Raw Data, chunk by chunk
     # Rename cols based on mapping
     # dataset.py loaded with raw DB names, let's normalize
-    # Actually load_raw_data uses 'r.date as race_date', let's stick to our conventions
     # COLUMN_MAPPING was: 'race_date' -> 'date'
+    db_columns = None if columns is None else [RAW_NAMES.get(c, c) for c in columns]
+    before = 0.0
+    chunks = []
+    for chunk in iter_raw_data(start_date, end_date, db_columns, lookback):
+        chunk = chunk.rename(columns={k: v for k, v in COLUMN_MAPPING.items() if k in chunk.columns})
+        # Ensure date usage
+        chunk['date'] = pd.to_datetime(chunk['date'])
+        # Typed before the next chunk is read; categories once all chunks are in
+        before += frame_memory_mb(chunk)
+        chunks.append(apply_dtype_policy(chunk, categories=False))
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
     
-    # Apply mapping normalization
-    # Reverse mapping for rename? 
-    # dataset.py: 'race_date': 'date'
-    rename_dict = {k:v for k,v in COLUMN_MAPPING.items() if k in df.columns}
-    df = df.rename(columns=rename_dict)
-    
-    # Ensure date usage
-    df['date'] = pd.to_datetime(df['date'])
-    
-    print("\n🛠️ BUILDING FEATURES...")
-    
-    # 2. History Features
-    print("  > 1/3 History (Last N)...")
-    # Using v2 (Fixed with Reindexing)
-    df_hist = calculate_history_features_v2(df)
+    # Dtype policy at load: categories for identities, small ints, float32
+    apply_dtype_policy(df)
+    print(f"  > Memory [raw]: {before:.1f} MB -> {frame_memory_mb(df):.1f} MB compacted ({df.shape[0]} rows)")
+    return df
+
+def build_features_for_dataset(start_date=None, end_date=None, columns=None):
+    """
+    Main pipeline to load DB data and generate features.
+    columns: feature (or raw) columns the caller needs, e.g. FEATURE_COLS; the
+    registry (tjk.features.registry) resolves them to the families and columns
+    that have to be computed. Default: every registered feature.
+    With `columns` only the raw columns they read (plus the keys) are loaded.
+    With a start_date, history features still see the earlier races they need:
+    the loader adds the lookback rows of the horses in the range (the longest
+    lookback of the plan), which are dropped from the result. A range build
+    equals the full build restricted to the range.
+    The result is memoized on disk (tjk.features.cache) by range, columns, DB
+    watermark and feature code version: unchanged data loads from the cache.
+    """
+    cache = FeatureCache()
+    key = None
+    if settings.FEATURE_CACHE_ENABLED and cache.available:
+        with read_session() as db:
+            key = cache.key(db.connection(), start_date, end_date, columns, resolve(columns).lookback)
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"♻️ Features loaded from cache ({cached.shape[0]} rows, {cached.shape[1]} columns).")
+            return cached
     
-    # 3. Specialization Features
-    print("  > 2/3 Specialization (Track/Dist)...")
-    df_spec = calculate_specialization_features_v2(df)
+    full_df = _build_features(start_date, end_date, columns)
     
-    # 4. Relative Features
-    print("  > 3/3 Relative (In-Race)...")
-    df_rel = calculate_relative_features(df)
+    if key is not None:
+        cache.put(key, full_df, start=str(start_date), end=str(end_date),
+                  columns=None if columns is None else list(columns))
+    return full_df
+
+def _build_features(start_date, end_date, columns):
+    """
+    Loads + computes (no memo). With the full history (no date bounds) features
+    come from the persisted feature store (tjk.features.store): only months
+    whose rows or feature code changed are computed. Otherwise the families
+    run in a process pool when the frame is large (tjk.features.parallel).
+    """
+    plan = resolve(columns)
+    store = FeatureStore()
+    use_store = start_date is None and end_date is None and settings.FEATURE_STORE_ENABLED and store.available
+    load_columns = None
+    if columns is not None:
+        known = set(raw_ml_columns())
+        missing = [c for c in plan.passthrough if c not in known]
+        if missing:
+            raise ValueError(f"Unknown feature/column(s): {missing}")
+        # The store computes (and persists) whole families
+        inputs = [c for f in plan.families for c in family_inputs(f)] if use_store else plan.raw_inputs
+        load_columns = list(dict.fromkeys(KEY_COLUMNS + inputs + plan.passthrough))
+        print(f"  > Feature plan: {len(plan.requested)} requested -> {len(plan.features)} computed "
+              f"({', '.join(plan.families) or 'no families'}), cost {plan.cost}/{resolve().cost}, "
+              f"{len(load_columns)}/{len(known)} raw columns")
+    lookback = plan.lookback if start_date is not None else 0
     
-    # 5. Merge All
-    # Indexes should align perfectly as we didn't drop rows (filled NA)
-    print(f"DEBUG: Builder - Hist Index: {df_hist.index}")
-    print(f"DEBUG: Builder - Spec Index: {df_spec.index}")
-    print(f"DEBUG: Builder - Rel Index: {df_rel.index}")
-    print(f"DEBUG: Builder - Main DF Index: {df.index}")
+    df = load_normalized_data(start_date, end_date, load_columns, lookback)
     
-    # Combine
-    # Note: We must ensure indices align.
-    # df_hist was created from sorted df.
-    # We must join on index?
-    # Or did sub-functions sort df?
+    if use_store:
+        print("\n🛠️ BUILDING FEATURES (feature store)...")
+        family_frames = store.features(df, plan.families)
+    else:
+        print("\n🛠️ BUILDING FEATURES...")
+        workers = feature_workers(len(df))
+        if workers > 1 and plan.by_family:
+            tasks = family_parts(plan.by_family)
+            print(f"  > {len(plan.by_family)} families ({len(tasks)} tasks) on {min(workers, len(tasks))} processes...")
+            family_frames = run_families_parallel(df, plan.by_family, workers)
+        else:
+            family_frames = {}
+            for i, (family, names) in enumerate(plan.by_family.items(), start=1):
+                spec = FAMILIES[family]
+                print(f"  > {i}/{len(plan.by_family)} {spec.label}...")
+                family_frames[family] = spec.func(df, columns=names)
+                # Indexes should align perfectly as we didn't drop rows (filled NA)
+                debug_capture.log(f"Builder - {family} Index: {family_frames[family].index}")
+        debug_capture.log(f"Builder - Main DF Index: {df.index}")
     
-    # Concatenate columns
-    all_features = pd.concat([df, df_hist, df_spec, df_rel], axis=1)
+    # Combine: raw columns + requested features (dependencies only computed), family by family,
+    # each compacted before the concat so float64 copies never pile up
+    features = [
+        apply_dtype_policy(frame[[c for c in frame.columns if c in plan.requested]])
+        for frame in family_frames.values()
+    ]
+    all_features = pd.concat([df] + features, axis=1)
     
     # Drop "duplicate" cols if any (concat usually handles unique names)
-    # Check for empty cols
     full_df = all_features.loc[:, ~all_features.columns.duplicated()]
+    if lookback != 0:
+        # Earlier rows only fed the lookback
+        full_df = full_df[full_df['date'] >= pd.Timestamp(start_date)].reset_index(drop=True)
+    memory_report(full_df, "features")
     
     print(f"✅ Feature Engineering Complete. Shape: {full_df.shape}")
     return full_df
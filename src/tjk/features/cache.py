@@ -0,0 +1,137 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from tjk.config import settings
+from tjk.features.registry import FAMILIES
+from tjk.features.store import family_version
+from tjk.storage.watermark import data_watermark
+
+try:
+    import pyarrow  # noqa: F401  (parquet engine)
+except ImportError:  # Optional: pip install pyarrow (the builder then always computes)
+    pyarrow = None
+
+# Bump when the cached frame layout changes
+CACHE_FORMAT = 1
+
+# Code outside the families that shapes the builder output
+_BUILDER_MODULES = ['tjk.features.builder', 'tjk.features.parallel', 'tjk.features.registry', 'tjk.ml.dataset']
+
+
+def feature_code_version() -> str:
+    """Every family version plus the loader / builder / registry sources."""
+    parts = [f"{CACHE_FORMAT}"] + [family_version(f) for f in FAMILIES]
+    for name in _BUILDER_MODULES:
+        module = sys.modules.get(name)
+        parts.append(inspect.getsource(module) if module else name)
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:12]
+
+
+class FeatureCache:
+    """
+    On-disk memo of build_features_for_dataset outputs, one Parquet file per key:
+        {root}/{key}.parquet
+        {root}/index.json   {key: {"bytes", "last_used", "created", "start", "end", "columns"}}
+    key = (start_date, end_date, columns, data watermark of the months read,
+    feature code version). A DB change moves the watermark and a feature code
+    change moves the version, so stale entries are never hit; they just age out.
+    Least recently used entries are evicted once the total exceeds max_bytes.
+    """
+    def __init__(self, root: Path = None, max_bytes: int = None):
+        self.root = Path(root or settings.FEATURE_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.FEATURE_CACHE_MAX_MB * 1024 * 1024
+        self.index_path = self.root / "index.json"
+
+    @property
+    def available(self) -> bool:
+        return pyarrow is not None
+
+    def key(self, conn, start_date=None, end_date=None, columns=None, lookback=0) -> str:
+        # A lookback build also reads the months before start_date (load_raw_data)
+        since = start_date if lookback == 0 else None
+        parts = [
+            str(start_date), str(end_date),
+            repr(None if columns is None else list(columns)),
+            data_watermark(conn, since, end_date),
+            feature_code_version(),
+        ]
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.parquet"
+
+    def load_index(self) -> dict:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(index, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            return None  # Torn/foreign file: treated as a miss and overwritten by put()
+        index = self.load_index()
+        if key in index:
+            index[key]["last_used"] = time.time()
+            self._save_index(index)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame, **meta) -> int:
+        """Writes one entry, then evicts LRU entries over max_bytes. Returns entries evicted."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".parquet.{os.getpid()}.tmp")
+        df.to_parquet(tmp, compression="zstd")
+        os.replace(tmp, path)
+
+        now = time.time()
+        index = self.load_index()
+        index[key] = {"bytes": path.stat().st_size, "created": now, "last_used": now, **meta}
+        evicted = self._evict(index, keep=key)
+        self._save_index(index)
+        return evicted
+
+    def _evict(self, index: dict, keep: str = None) -> int:
+        # Drop entries whose file is gone (manual cleanup), then oldest-used first
+        for key in [k for k in index if not self._path(k).exists()]:
+            del index[key]
+        total = sum(e["bytes"] for e in index.values())
+        evicted = 0
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._path(key).unlink(missing_ok=True)
+            total -= index.pop(key)["bytes"]
+            evicted += 1
+        return evicted
+
+    def clear(self) -> int:
+        index = self.load_index()
+        for key in index:
+            self._path(key).unlink(missing_ok=True)
+        self._save_index({})
+        return len(index)
+
+    def stats(self) -> dict:
+        index = self.load_index()
+        return {"entries": len(index), "bytes": sum(e["bytes"] for e in index.values()), "max_bytes": self.max_bytes}
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Identities: few distinct values repeated on many rows (normalized names)
+CATEGORY_COLUMNS = ['city', 'surface', 'horse', 'jockey', 'trainer', 'race_id', 'horse_id', 'owner_id']
+
+# Small counts that are never missing (NOT NULL): int16
+SMALL_INT_COLUMNS = ['race_no']
+
+# Ranks, counts and small measures that can be missing (a program day has no
+# ranks yet, field_size is NaN for rows without a race key):
+# always float32, whatever the loaded rows hold, so a column has one dtype in every
+# frame (feature store fingerprints hash it). float32 holds every int16 exactly
+# and keeps NaN semantics for rank <= 3 etc.
+NULLABLE_INT_COLUMNS = ['saddle_no', 'rank', 'hp', 'kgs', 's20', 'distance', 'field_size']
+
+# Stay as they are: row / race / dimension keys (joins, cache and store ids) and dates
+KEEP_COLUMNS = ['id', 'race_key', 'city_key', 'horse_key', 'jockey_key', 'trainer_key', 'owner_key', 'date']
+
+
+def apply_dtype_policy(df: pd.DataFrame, categories: bool = True) -> pd.DataFrame:
+    """
+    Compacts a raw or feature frame in place (and returns it): identities ->
+    category, counts -> int16, nullable ranks/measures and every other float
+    -> float32. The dtype depends on the column only, never on its values.
+    Unknown string columns are left alone.
+    categories=False keeps identities as strings: for chunks that are
+    concatenated later (categories of different chunks would not match).
+    """
+    for col in df.columns:
+        values = df[col]
+        if col in KEEP_COLUMNS:
+            continue
+        if col in CATEGORY_COLUMNS:
+            if categories and not isinstance(values.dtype, pd.CategoricalDtype):
+                df[col] = values.astype('category')
+        elif col in SMALL_INT_COLUMNS and pd.api.types.is_numeric_dtype(values):
+            if values.dtype != 'int16':
+                df[col] = values.to_numpy(dtype='int16')
+        elif col in NULLABLE_INT_COLUMNS and pd.api.types.is_numeric_dtype(values):
+            if values.dtype != 'float32':
+                df[col] = values.to_numpy(dtype='float32', na_value=np.nan)
+        elif pd.api.types.is_float_dtype(values) and values.dtype != 'float32':
+            df[col] = values.astype('float32')
+    return df
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def memory_report(df: pd.DataFrame, stage: str) -> float:
+    """Prints the frame's deep memory use for a pipeline stage; returns MB."""
+    mb = frame_memory_mb(df)
+    print(f"  > Memory [{stage}]: {mb:.1f} MB ({df.shape[0]} rows x {df.shape[1]} cols)")
+    return mb
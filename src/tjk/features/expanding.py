@@ -0,0 +1,95 @@
+import pandas as pd
+import numpy as np
+
+STAT_COLUMNS = ['races', 'wins', 'places']
+
+
+def group_codes(frame: pd.DataFrame, by) -> np.ndarray:
+    """
+    One integer code per row for the combination of the `by` columns
+    (-1 when any of them is missing), without building string keys.
+    """
+    codes = np.zeros(len(frame), dtype='int64')
+    missing = np.zeros(len(frame), dtype=bool)
+    for col in by:
+        col_codes, uniques = pd.factorize(frame[col])
+        missing |= col_codes < 0
+        codes = codes * (len(uniques) + 1) + col_codes
+        # Keep the combined codes dense so many columns cannot overflow
+        codes = pd.factorize(codes)[0]
+    codes[missing] = -1
+    return codes
+
+
+def _prior_sums(codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Sum of `values` over the earlier rows with the same code (row order = time order)."""
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    starts = np.maximum.accumulate(np.where(is_start, np.arange(len(codes)), 0))
+
+    inclusive = np.cumsum(values[order])
+    exclusive = inclusive - values[order]
+    out = np.empty(len(codes), dtype='float64')
+    out[order] = exclusive - exclusive[starts]
+    return out
+
+
+def expanding_stats(frame: pd.DataFrame, by, state=None, name=None) -> pd.DataFrame:
+    """
+    Prior-only (leak-free) career stats per group of the `by` columns: for every
+    row, the races / wins / places of the same group on EARLIER rows, and the
+    win / place rates (0 before the first race). Rows must be in time order;
+    rows with a missing key get NaN.
+
+    Args:
+        frame: Rows in chronological order with 'rank' and the `by` columns.
+        by: Grouping columns, e.g. ['horse', 'surface'] or ['jockey'].
+        state: Optional dict to resume from (tjk.features.store). state[name]
+            holds the totals per group after the previous frames; `frame` must
+            then only contain later dates. Updated in place.
+        name: Key of this grouping in `state` (default: the joined column names).
+
+    Returns:
+        DataFrame (races, wins, places, win_rate, place_rate) aligned to frame.index.
+    """
+    by = list(by)
+    rank = frame['rank'].to_numpy(dtype='float64', na_value=np.nan)
+    outcomes = {
+        'races': np.ones(len(frame)),
+        'wins': (rank == 1).astype('float64'),
+        'places': (rank <= 3).astype('float64'),
+    }
+
+    # One stable pass per grouping: exclusive grouped cumulative sums
+    codes = group_codes(frame, by)
+    stats = {col: _prior_sums(codes, values) for col, values in outcomes.items()}
+
+    if state is not None:
+        name = name or '_'.join(by)
+        carried = state.get(name)
+        keys = frame[by].reset_index(drop=True)
+        if carried is not None:
+            # Totals of earlier frames (left merge keeps row order; missing keys never match)
+            offsets = keys.merge(carried, on=by, how='left')
+            for col in STAT_COLUMNS:
+                stats[col] = stats[col] + offsets[col].fillna(0).values
+
+        # Totals after this frame: each group's last row plus that row's outcome
+        known = codes >= 0
+        last = ~pd.Series(codes).duplicated(keep='last').values & known
+        totals = keys[last].copy()
+        for col in STAT_COLUMNS:
+            totals[col] = stats[col][last] + outcomes[col][last]
+        if carried is not None:
+            totals = pd.concat([carried, totals], ignore_index=True)
+            totals = totals.drop_duplicates(subset=by, keep='last').reset_index(drop=True)
+        state[name] = totals
+
+    result = pd.DataFrame({col: stats[col] for col in STAT_COLUMNS}, index=frame.index)
+    result.loc[codes < 0, STAT_COLUMNS] = np.nan
+    races = result['races'].where(result['races'] > 0, 1)
+    result['win_rate'] = result['wins'] / races
+    result['place_rate'] = result['places'] / races
+    return result
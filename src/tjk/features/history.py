@@ -2,79 +2,112 @@
 import pandas as pd
 import numpy as np
 
-def calculate_history_features_v2(df, lookback_windows=[3, 5, 10]):
+
+def _segment_starts(keys: np.ndarray) -> np.ndarray:
+    """Index of the first row of each row's segment (keys sorted, equal keys contiguous)."""
+    codes = pd.factorize(keys)[0]
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(len(codes)), 0))
+
+
+def _shift_in_segments(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """groupby().shift(1): previous row's value, NaN on the first row of a segment."""
+    shifted = np.empty(len(values), dtype='float64')
+    shifted[1:] = values[:-1]
+    shifted[starts == np.arange(len(values))] = np.nan
+    return shifted
+
+
+def _rolling_mean_in_segments(values: np.ndarray, starts: np.ndarray, n: int) -> np.ndarray:
+    """
+    groupby().rolling(n, min_periods=1).mean() from prefix sums: mean of the
+    non-NaN values among the last n rows of the segment, NaN if there is none.
+    Values are small integers (ranks, 0/1 flags), so the sums are exact and the
+    result is bit-identical to pandas.
+    """
+    valid = ~np.isnan(values)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    ccount = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(starts, end - n)
+    count = ccount[end] - ccount[begin]
+    total = csum[end] - csum[begin]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def calculate_history_features_v2(df, lookback_windows=[3, 5, 10], state=None, columns=None):
     """
     Calculates Last-N history features for each horse.
-    
+
     Args:
         df: DataFrame containing all past races.
         lookback_windows: List of N values (e.g., [3, 5])
-        
+        state: Optional dict to resume from (tjk.features.store). state['tail'] holds
+            the last max(lookback_windows) races (horse, date, rank) of every horse
+            seen so far; `df` must then only contain later dates. Updated in place.
+        columns: Optional subset of the feature names to compute (default: all).
+
     Returns:
         DataFrame with new feature columns, aligned to input df index.
     """
-    # 1. Preserve Original Index for final alignment
-    # df might come in with any index (e.g. RangeIndex).
-    # We want to return a DF that matches this index exactly.
-    original_idx = df.index
-    
-    # 2. Create Working Copy
-    # We add a column to track the original index explicitly
-    df_work = df.copy()
-    df_work['__orig_index'] = df_work.index
-    
-    # 3. Sort by Horse/Date
-    df_work = df_work.sort_values(['horse', 'date'])
-    
-    # Calculate binary targets
-    df_work['is_win'] = (df_work['rank'] == 1).astype(int)
-    df_work['is_place'] = (df_work['rank'] <= 3).astype(int)
-    
-    # 4. Create Clean Slate for Vectorized Ops
-    # We strip the index to generic RangeIndex to avoid any MultiIndex/Alignment issues during rolling
-    # But we keep '__orig_index' as a column
-    df_clean = pd.DataFrame(df_work.to_dict('records'))
-    
-    # 5. Group and Shift
-    grouped = df_clean.groupby('horse', sort=False) # df_clean is sorted by horse
-    
-    # Vectorized shifts (using .values to avoid index issues)
-    prev_rank = grouped['rank'].shift(1).values
-    prev_win = grouped['is_win'].shift(1).values
-    prev_place = grouped['is_place'].shift(1).values
-    
-    # 6. Add shifts to df_clean safely
-    df_clean['prev_rank'] = prev_rank
-    df_clean['prev_win'] = prev_win
-    df_clean['prev_place'] = prev_place
-    
-    # 7. Rolling Calculations using loop
-    features_dict = {}
-    
-    # Re-group (on the now modified df_clean)
-    grouped_rolling = df_clean.groupby('horse', sort=False)
-    
+    # 1. Working Frame: only the columns the features need, rows tracked by position
+    work = pd.DataFrame({
+        'horse': df['horse'].values,
+        'date': df['date'].values,
+        'rank': df['rank'].values,
+        '__pos': np.arange(len(df)),
+    })
+
+    # Resume: the previous races of each horse only feed the rolling windows (__pos = -1)
+    tail = state.get('tail') if state is not None else None
+    if tail is not None:
+        in_frame = tail['horse'].isin(work['horse'])
+        context = tail[in_frame].assign(__pos=-1)
+        work = pd.concat([context, work], ignore_index=True)
+        tail = tail[~in_frame]
+
+    # 2. Sort by Horse/Date (stable: same-day ties keep input order)
+    work = work.sort_values(['horse', 'date'], kind='mergesort').reset_index(drop=True)
+    starts = _segment_starts(work['horse'].values)
+
+    # 3. Previous race of the same horse (binary targets from the rank)
+    rank = work['rank'].to_numpy(dtype='float64', na_value=np.nan)
+    targets = {
+        'avg_rank': rank,
+        'win_rate': (rank == 1).astype('float64'),
+        'place_rate': (rank <= 3).astype('float64'),
+    }
+
+    # 4. Rolling Means over the last N previous races (requested columns only)
+    features_dict, prev = {}, {}
     for n in lookback_windows:
-        def calc_roll(col):
-            return grouped_rolling[col].rolling(n, min_periods=1).mean().values
-            
-        features_dict[f'avg_rank_last{n}'] = calc_roll('prev_rank')
-        features_dict[f'win_rate_last{n}'] = calc_roll('prev_win')
-        features_dict[f'place_rate_last{n}'] = calc_roll('prev_place')
-        
-    # 8. Create Result DataFrame
-    # Initial creation with df_clean's RangeIndex
-    features = pd.DataFrame(features_dict, index=df_clean.index)
-    
-    # 9. Restore Original Index Alignment
-    # df_clean['__orig_index'] holds the original index values in the sorted order.
-    features.index = df_clean['__orig_index']
-    
-    # 10. Reindex to match INPUT df order
-    # This ensures that features[0] corresponds to input_df[0]
-    features = features.reindex(original_idx)
-    
-    # Fill NAs
+        for name, target in targets.items():
+            col = f'{name}_last{n}'
+            if columns is not None and col not in columns:
+                continue
+            if name not in prev:
+                prev[name] = _shift_in_segments(target, starts)
+            features_dict[col] = _rolling_mean_in_segments(prev[name], starts, n)
+
+    if state is not None:
+        # Last max(N) races of every horse in this frame (rows counted back from the segment end)
+        ends = np.append(starts[1:] != starts[:-1], True)
+        seg_end = np.minimum.accumulate(np.where(ends, np.arange(len(work)), len(work))[::-1])[::-1]
+        keep = (seg_end - np.arange(len(work)) < max(lookback_windows)) & work['horse'].notna().values
+        last = work.loc[keep, ['horse', 'date', 'rank']].reset_index(drop=True)
+        state['tail'] = pd.concat([tail, last], ignore_index=True) if tail is not None else last
+
+    # 5. Back to INPUT df order (context rows dropped), NAs filled
+    pos = work['__pos'].values
+    own = pos >= 0
+    features = pd.DataFrame(index=df.index)
+    for name, values in features_dict.items():
+        out = np.empty(len(df), dtype='float64')
+        out[pos[own]] = values[own]
+        features[name] = out
+
     features = features.fillna(-1)
-    
+
     return features
@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tjk.config import settings
+from tjk.features.registry import FAMILIES, REGISTRY, resolve
+
+# Offsets of the packed columns (8-byte aligned for every dtype)
+_ALIGN = 8
+
+
+def feature_workers(n_rows: int) -> int:
+    """Worker processes for a frame of n_rows (settings.FEATURE_WORKERS, 0 = one per core); 1 = in-process."""
+    if n_rows < settings.FEATURE_PARALLEL_MIN_ROWS:
+        return 1
+    return settings.FEATURE_WORKERS or os.cpu_count() or 1
+
+
+def family_parts(by_family: Dict[str, List[str]]) -> List[Tuple[str, List[str]]]:
+    """(family, features) tasks: a family's features split by their registry part, in order."""
+    tasks = []
+    for family, names in by_family.items():
+        parts: Dict[str, List[str]] = {}
+        for name in names:
+            parts.setdefault(REGISTRY[name].part, []).append(name)
+        tasks += [(family, part) for part in parts.values()]
+    return tasks
+
+
+def _pack(df: pd.DataFrame, columns: List[str]) -> Tuple[shared_memory.SharedMemory, dict]:
+    """
+    Copies `columns` into one shared memory block. Numbers and datetimes keep
+    their dtype, categories travel as codes (+ their categories), other
+    columns as sorted factorize codes. Returns the block and its layout:
+        {column: (dtype, offset, categories or None)}
+    """
+    arrays, layout, offset = {}, {}, 0
+    for col in columns:
+        values = df[col]
+        categories = None
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            array, categories = values.cat.codes.to_numpy(), values.cat.categories
+        elif values.dtype.kind in 'biufM':
+            array = values.to_numpy()
+        else:
+            codes, categories = pd.factorize(values, sort=True)
+            array = codes.astype('int32')
+        arrays[col] = array
+        layout[col] = (array.dtype.str, offset, categories)
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for col, array in arrays.items():
+        dtype, start, _ = layout[col]
+        np.ndarray(array.shape, dtype=dtype, buffer=block.buf, offset=start)[:] = array
+    return block, layout
+
+
+def _unpack(block: shared_memory.SharedMemory, layout: dict, n_rows: int) -> pd.DataFrame:
+    """Frame over the shared block (no copy of numeric columns)."""
+    data = {}
+    for col, (dtype, start, categories) in layout.items():
+        array = np.ndarray((n_rows,), dtype=dtype, buffer=block.buf, offset=start)
+        data[col] = array if categories is None else pd.Categorical.from_codes(array, categories)
+    return pd.DataFrame(data, copy=False)
+
+
+def _run_part(block_name: str, layout: dict, n_rows: int, family: str, names: List[str]) -> Dict[str, np.ndarray]:
+    """Worker: one family part on the shared input columns. Returns {feature: values} in row order."""
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        df = _unpack(block, layout, n_rows)
+        features = FAMILIES[family].func(df, columns=names)
+        out = {name: features[name].to_numpy(copy=True) for name in features.columns}
+        del df, features
+        return out
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            pass  # A view is still referenced; the mapping goes with the process
+
+
+def run_families_parallel(df: pd.DataFrame, by_family: Dict[str, List[str]], workers: int) -> Dict[str, pd.DataFrame]:
+    """
+    Computes the families of a FeaturePlan (by_family) in a process pool: the
+    input columns they read are placed once in shared memory (workers map
+    them instead of unpickling a frame), each family part (family_parts)
+    is one task and only the feature arrays come back. Results are merged
+    per family on df.index, columns in by_family order: same frames as
+    calling each family function in-process.
+    """
+    inputs = resolve([name for names in by_family.values() for name in names]).raw_inputs
+    if 'race_key' not in df.columns:
+        inputs += ['date', 'city', 'race_no']  # Relative features group by them instead
+    columns = [c for c in dict.fromkeys(inputs) if c in df.columns]
+    tasks = family_parts(by_family)
+
+    block, layout = _pack(df, columns)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [
+                (family, pool.submit(_run_part, block.name, layout, len(df), family, names))
+                for family, names in tasks
+            ]
+            results: Dict[str, dict] = {family: {} for family in by_family}
+            for family, future in futures:
+                results[family].update(future.result())
+    finally:
+        block.close()
+        block.unlink()
+
+    frames = {}
+    for family, names in by_family.items():
+        computed = results[family]
+        frames[family] = pd.DataFrame({name: computed[name] for name in names if name in computed}, index=df.index)
+    return frames
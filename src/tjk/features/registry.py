@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tjk.features.history import calculate_history_features_v2
+from tjk.features.relative import calculate_relative_features
+from tjk.features.specialization import calculate_specialization_features_v2
+
+
+@dataclass(frozen=True)
+class FamilySpec:
+    """A feature family: one function computing several columns from the same passes."""
+    name: str
+    func: Callable          # func(df, columns=None[, state=None]) -> features aligned to df.index
+    stateful: bool          # Carries state across dates (tjk.features.store resumes it)
+    label: str              # Builder progress line
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """One output column: its family, what it is computed from and its relative cost."""
+    name: str
+    family: str
+    inputs: Tuple[str, ...]   # Raw columns (normalized names) or other registered features
+    cost: int = 1             # ~ array passes over the rows
+    lookback: Optional[int] = 0   # Prior races per horse it reads: N, 0 = none, None = whole career
+    part: str = ''            # Features of a family sharing a part run as one task (tjk.features.parallel)
+
+
+FAMILIES: Dict[str, FamilySpec] = {
+    f.name: f for f in [
+        FamilySpec('history', calculate_history_features_v2, True, 'History (Last N)'),
+        FamilySpec('specialization', calculate_specialization_features_v2, True, 'Specialization (Track/Dist)'),
+        FamilySpec('relative', calculate_relative_features, False, 'Relative (In-Race)'),
+    ]
+}
+
+
+def _features() -> List[FeatureSpec]:
+    specs = []
+
+    # History: prefix sums over horse-sorted arrays, one pass per column
+    for n in [3, 5, 10]:
+        for prefix in ['avg_rank', 'win_rate', 'place_rate']:
+            specs.append(FeatureSpec(f'{prefix}_last{n}', 'history', ('horse', 'date', 'rank'), lookback=n, part=f'last{n}'))
+
+    # Specialization: one expanding_stats pass (stable sort + grouped sums) per grouping,
+    # over every earlier race of the horse
+    career = None
+    specs += [
+        FeatureSpec('same_track_win_rate', 'specialization', ('horse', 'surface', 'date', 'rank'), cost=3,
+                    lookback=career, part='track'),
+        FeatureSpec('global_win_rate', 'specialization', ('horse', 'date', 'rank'), cost=3,
+                    lookback=career, part='global'),
+        FeatureSpec('track_specialization_ratio', 'specialization', ('same_track_win_rate', 'global_win_rate'),
+                    part='track'),
+        FeatureSpec('same_dist_win_rate', 'specialization', ('horse', 'distance', 'date', 'rank'), cost=3,
+                    lookback=career, part='dist'),
+        FeatureSpec('dist_specialization_ratio', 'specialization', ('same_dist_win_rate', 'global_win_rate'),
+                    part='dist'),
+    ]
+
+    # Relative: bincount reductions per race; ranks and percentiles need a lexsort
+    race = ('race_key',)
+    specs += [
+        FeatureSpec('relative_weight', 'relative', race + ('weight',), part='weight'),
+        FeatureSpec('relative_hp', 'relative', race + ('hp',), part='hp'),
+        FeatureSpec('hp_rank_in_race', 'relative', race + ('hp',), cost=2, part='hp'),
+        FeatureSpec('weight_rank_in_race', 'relative', race + ('weight',), cost=2, part='weight'),
+        FeatureSpec('field_size', 'relative', race + ('horse',), part='field'),
+        FeatureSpec('weight_z_in_race', 'relative', race + ('weight',), cost=2, part='weight'),
+        FeatureSpec('hp_z_in_race', 'relative', race + ('hp',), cost=2, part='hp'),
+        FeatureSpec('weight_pct_in_race', 'relative', race + ('weight',), cost=2, part='weight'),
+        FeatureSpec('hp_pct_in_race', 'relative', race + ('hp',), cost=2, part='hp'),
+    ]
+    return specs
+
+
+# name -> spec, in builder output order (family by family)
+REGISTRY: Dict[str, FeatureSpec] = {spec.name: spec for spec in _features()}
+
+
+@dataclass
+class FeaturePlan:
+    """Minimal computation for a requested column list (see resolve)."""
+    requested: List[str]                 # Registered features asked for, in request order
+    passthrough: List[str]               # Requested names that are not features (raw columns)
+    features: List[str]                  # requested + their feature dependencies, dependencies first
+    by_family: Dict[str, List[str]]      # family -> features it has to compute, in FAMILIES order
+    raw_inputs: List[str]                # Raw columns the features read
+    cost: int
+    lookback: Optional[int]              # Longest per-horse lookback of `features` (None = whole career)
+
+    @property
+    def families(self) -> List[str]:
+        return list(self.by_family)
+
+
+def resolve(columns: Optional[Iterable[str]] = None) -> FeaturePlan:
+    """
+    Walks the dependency graph of `columns` (default: every registered feature).
+    Names that are not registered are returned as passthrough (raw columns, the
+    caller checks them); an unregistered feature input is a raw column.
+    """
+    columns = list(REGISTRY) if columns is None else list(dict.fromkeys(columns))
+    requested = [c for c in columns if c in REGISTRY]
+    passthrough = [c for c in columns if c not in REGISTRY]
+
+    ordered, raw_inputs = [], {}
+    visiting = set()
+
+    def visit(name: str):
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError(f"Feature dependency cycle at '{name}'")
+        visiting.add(name)
+        for dep in REGISTRY[name].inputs:
+            if dep in REGISTRY:
+                visit(dep)
+            else:
+                raw_inputs[dep] = None
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in requested:
+        visit(name)
+
+    needed = set(ordered)
+    by_family = {}
+    for family in FAMILIES:
+        names = [n for n in REGISTRY if n in needed and REGISTRY[n].family == family]
+        if names:
+            by_family[family] = names
+
+    lookbacks = [REGISTRY[n].lookback for n in ordered]
+    return FeaturePlan(
+        requested=requested,
+        passthrough=passthrough,
+        features=ordered,
+        by_family=by_family,
+        raw_inputs=list(raw_inputs),
+        cost=sum(REGISTRY[n].cost for n in ordered),
+        lookback=None if None in lookbacks else max(lookbacks, default=0),
+    )
+
+
+def family_inputs(family: str) -> List[str]:
+    """Raw columns read by every feature of `family` (what a whole-family run needs)."""
+    return resolve([name for name, spec in REGISTRY.items() if spec.family == family]).raw_inputs
@@ -1,42 +1,118 @@
 import pandas as pd
 import numpy as np
 
-def calculate_relative_features(df):
+from tjk.features.expanding import group_codes
+
+
+def _field_stats(codes: np.ndarray, n_groups: int, values: np.ndarray) -> dict:
+    """
+    Per-row stats of `values` within its field (group code), from group-level
+    reductions broadcast back with the codes: field mean, deviation from it,
+    z-score (sample std, 0 when the field has no spread), rank (1 = highest,
+    ties averaged like pandas rank) and percentile (share of the field at or
+    below the value). NaN values get NaN stats and are left out of the field's.
+    """
+    valid = ~np.isnan(values)
+    counts = np.bincount(codes, weights=valid, minlength=n_groups)
+    sums = np.bincount(codes, weights=np.where(valid, values, 0.0), minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (sums / counts)[codes]
+        deviation = values - mean
+        squares = np.bincount(codes, weights=np.where(valid, deviation, 0.0) ** 2, minlength=n_groups)
+        std = np.sqrt(squares / (counts - 1))[codes]
+        z = np.where(std > 0, deviation / std, 0.0)
+    z[~valid] = np.nan
+
+    # Descending rank: sort by (field, -value), NaN last; ties share the average position
+    order = np.lexsort((-values, codes))
+    sorted_codes, sorted_values = codes[order], values[order]
+    position = np.arange(len(values))
+    new_field = np.ones(len(values), dtype=bool)
+    new_field[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    field_start = np.maximum.accumulate(np.where(new_field, position, 0))
+    new_tie = new_field.copy()
+    new_tie[1:] |= sorted_values[1:] != sorted_values[:-1]
+    tie_id = np.cumsum(new_tie) - 1
+    tie_first = position[new_tie]
+    tie_last = np.append(tie_first[1:], len(values)) - 1
+    rank = np.empty(len(values), dtype='float64')
+    rank[order] = (tie_first + tie_last)[tie_id] / 2 - field_start + 1
+    rank[~valid] = np.nan
+    n = counts[codes]
+
+    return {
+        'mean': mean,
+        'deviation': deviation,
+        'z': z,
+        'rank': rank,
+        'pct': (n + 1 - rank) / n,
+    }
+
+
+# feature -> (input, _field_stats key); field_size counts runners
+RELATIVE_FEATURES = {
+    'relative_weight': ('weight', 'deviation'),
+    'relative_hp': ('hp', 'deviation'),
+    # Rank within field before race: 1 = Highest HP / Heaviest
+    'hp_rank_in_race': ('hp', 'rank'),
+    'weight_rank_in_race': ('weight', 'rank'),
+    # Field Size (Context)
+    'field_size': ('horse', None),
+    'weight_z_in_race': ('weight', 'z'),
+    'hp_z_in_race': ('hp', 'z'),
+    'weight_pct_in_race': ('weight', 'pct'),
+    'hp_pct_in_race': ('hp', 'pct'),
+}
+
+
+def calculate_relative_features(df, columns=None):
     """
     Calculates features relative to the specific race field.
-    e.g. Weight vs Avg Weight, HP vs Avg HP.
+    e.g. Weight vs Avg Weight, HP vs Avg HP, z-scores and percentiles in the field.
+    Does not modify `df`. columns: optional subset of RELATIVE_FEATURES (default: all).
     """
-    # Group by Race ID (date + city + raceno)
-    # We don't have a specific race_id column in dataset loader yet, 
-    # but (date, city, race_no) is the key.
-    
-    group_cols = ['date', 'city', 'race_no']
-    grouped = df.groupby(group_cols)
-    
+    columns = list(RELATIVE_FEATURES) if columns is None else [c for c in RELATIVE_FEATURES if c in columns]
+    inputs = {RELATIVE_FEATURES[c][0] for c in columns}
+
+    # Group by race: one int race_key column from the loader,
+    # (date, city, race_no) for frames built without it.
+    group_cols = ['race_key'] if 'race_key' in df.columns else ['date', 'city', 'race_no']
+    codes = group_codes(df, group_cols)
+    known = codes >= 0
+    field = codes[known]
+    n_groups = int(field.max()) + 1 if len(field) else 0
+
+    stats = {}
+    if 'weight' in inputs:
+        # Weight: missing filled with the field's mean weight
+        weight = df['weight'].to_numpy(dtype='float64', na_value=np.nan)[known]
+        weight_counts = np.bincount(field, weights=~np.isnan(weight), minlength=n_groups)
+        weight_sums = np.bincount(field, weights=np.nan_to_num(weight), minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight_filled = np.where(np.isnan(weight), (weight_sums / weight_counts)[field], weight)
+        stats['weight'] = _field_stats(field, n_groups, weight_filled)
+    if 'hp' in inputs:
+        # HP: missing = 0 (unknown/debut)
+        hp_filled = np.nan_to_num(df['hp'].to_numpy(dtype='float64', na_value=np.nan)[known])
+        stats['hp'] = _field_stats(field, n_groups, hp_filled)
+
+    columns_values = {}
+    for name in columns:
+        source, key = RELATIVE_FEATURES[name]
+        if key is None:
+            runners = np.bincount(field, weights=df['horse'].notna().values[known], minlength=n_groups)
+            columns_values[name] = runners[field].astype('int64')
+        else:
+            columns_values[name] = stats[source][key]
+
+    # Rows without a race key belong to no field
     features = pd.DataFrame(index=df.index)
-    
-    # Weight Relative
-    # Fill NA weights with mean? NO, better to leave or 58 default?
-    # Let's fill with group mean.
-    df['weight_filled'] = grouped['weight'].transform(lambda x: x.fillna(x.mean()))
-    
-    # Field Average Weight
-    field_avg_weight = grouped['weight_filled'].transform('mean')
-    features['relative_weight'] = df['weight_filled'] - field_avg_weight
-    
-    # HP Relative
-    # Fill NA HP with 40 (unknown/debut)? 
-    # Or group min? Let's use 0 for safe math.
-    df['hp_filled'] = df['hp'].fillna(0)
-    field_avg_hp = grouped['hp_filled'].transform('mean')
-    features['relative_hp'] = df['hp_filled'] - field_avg_hp
-    
-    # Percentiles (Rank within field before race)
-    # e.g. Rank 1 = Highest HP.
-    features['hp_rank_in_race'] = grouped['hp_filled'].rank(ascending=False)
-    features['weight_rank_in_race'] = grouped['weight_filled'].rank(ascending=False) # 1 = Heaviest
-    
-    # Field Size (Context)
-    features['field_size'] = grouped['horse'].transform('count')
-    
+    for name, values in columns_values.items():
+        if known.all():
+            features[name] = values
+        else:
+            out = np.full(len(df), np.nan)
+            out[known] = values
+            features[name] = out
+
     return features
@@ -1,75 +1,76 @@
 import pandas as pd
 import numpy as np
 
-def calculate_specialization_features_v2(df):
+from tjk.features.expanding import expanding_stats
+
+# name -> grouping columns; each one is a single expanding_stats pass
+SPECIALIZATION_KEYS = {
+    'horse': ['horse'],
+    'horse_surface': ['horse', 'surface'],
+    'horse_dist': ['horse', 'dist_bucket'],
+}
+
+def distance_bucket(distance: pd.Series) -> np.ndarray:
+    """sprint (< 1300m) / mile (<= 1700m) / long, 'unknown' when missing or not a number."""
+    d = pd.to_numeric(distance, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return np.select([np.isnan(d), d < 1300, d <= 1700], ['unknown', 'sprint', 'mile'], 'long')
+
+# feature -> groupings it reads
+FEATURE_KEYS = {
+    'same_track_win_rate': ['horse_surface'],
+    'global_win_rate': ['horse'],
+    'track_specialization_ratio': ['horse_surface', 'horse'],
+    'same_dist_win_rate': ['horse_dist'],
+    'dist_specialization_ratio': ['horse_dist', 'horse'],
+}
+
+def calculate_specialization_features_v2(df, state=None, columns=None):
     """
     Calculates Track (Surface) and Distance specialization ratios.
     Performance is "Win Rate" under specific conditions vs Global Win Rate.
     Safe-Index implementation.
+    state: Optional dict to resume from (tjk.features.store): running totals
+        per SPECIALIZATION_KEYS grouping; `df` must then only contain later
+        dates. Updated in place.
+    columns: Optional subset of FEATURE_KEYS to compute (default: all); only the
+        groupings they read are passed over. Not combined with `state`.
     """
-    # 1. Preserve Original Index
-    original_idx = df.index
-    
-    # 2. Work on sorted copy with clean index
-    df_work = df.copy()
-    df_work['__orig_index'] = df_work.index
-    df_work = df_work.sort_values('date')
-    
-    # 3. Clean Slate
-    df_clean = pd.DataFrame(df_work.to_dict('records'))
-    
-    # 4. Global Stats
-    # Clean Groupby
-    grouped = df_clean.groupby('horse', sort=False)
-    
-    df_clean['is_win'] = (df_clean['rank'] == 1).astype(int)
-    
-    # Use transform for alignment
-    # shift(1).cumsum()
-    cum_wins = grouped['is_win'].transform(lambda x: x.shift(1).cumsum()).fillna(0)
-    cum_races = grouped.cumcount()
-    
-    global_win_rate = cum_wins / cum_races.replace(0, 1)
-    
-    # 5. Surface Specialization
-    df_clean['horse_surface'] = df_clean['horse'] + "_" + df_clean['surface']
-    surf_grp = df_clean.groupby('horse_surface', sort=False)
-    
-    surf_wins = surf_grp['is_win'].transform(lambda x: x.shift(1).cumsum()).fillna(0)
-    surf_count = surf_grp.cumcount()
-    
-    surf_win_rate = surf_wins / surf_count.replace(0, 1)
-    
-    # 6. Distance Specialization
-    def dist_bucket(d):
-        try:
-            d = float(d)
-        except: return 'unknown'
-        if d < 1300: return 'sprint'
-        elif d <= 1700: return 'mile'
-        else: return 'long'
-        
-    df_clean['dist_bucket'] = df_clean['distance'].apply(dist_bucket)
-    df_clean['horse_dist'] = df_clean['horse'] + "_" + df_clean['dist_bucket']
-    
-    dist_grp = df_clean.groupby('horse_dist', sort=False)
-    
-    dist_wins = dist_grp['is_win'].transform(lambda x: x.shift(1).cumsum()).fillna(0)
-    dist_count = dist_grp.cumcount()
-    
-    dist_win_rate = dist_wins / dist_count.replace(0, 1)
-    
-    # 7. Assemble Features
-    features = pd.DataFrame(index=df_clean.index)
-    features['same_track_win_rate'] = surf_win_rate
-    features['global_win_rate'] = global_win_rate
-    features['track_specialization_ratio'] = (surf_win_rate / global_win_rate.replace(0, 1)).fillna(0)
-    
-    features['same_dist_win_rate'] = dist_win_rate
-    features['dist_specialization_ratio'] = (dist_win_rate / global_win_rate.replace(0, 1)).fillna(0)
-    
-    # 8. Restore Index
-    features.index = df_clean['__orig_index']
-    features = features.reindex(original_idx)
-    
+    columns = list(FEATURE_KEYS) if columns is None else [c for c in FEATURE_KEYS if c in columns]
+    keys = {key for c in columns for key in FEATURE_KEYS[c]}
+
+    # 1. Chronological working frame (stable: same-day ties keep input order),
+    #    only the columns the groupings read
+    work = pd.DataFrame({'horse': df['horse'], 'rank': df['rank'], 'date': df['date']}, index=df.index)
+    if 'horse_surface' in keys:
+        work['surface'] = df['surface']
+    if 'horse_dist' in keys:
+        work['dist_bucket'] = distance_bucket(df['distance'])
+    work = work.sort_values('date', kind='mergesort')
+
+    # 2. Prior-only win rates per grouping (global, surface, distance bucket)
+    rates = {
+        name: expanding_stats(work, by, state=state, name=name)['win_rate']
+        for name, by in SPECIALIZATION_KEYS.items() if name in keys
+    }
+    global_win_rate = rates.get('horse')
+    surf_win_rate = rates.get('horse_surface')
+    dist_win_rate = rates.get('horse_dist')
+
+    # 3. Assemble Features
+    features = pd.DataFrame(index=work.index)
+    for name in columns:
+        if name == 'same_track_win_rate':
+            features[name] = surf_win_rate
+        elif name == 'global_win_rate':
+            features[name] = global_win_rate
+        elif name == 'track_specialization_ratio':
+            features[name] = (surf_win_rate / global_win_rate.replace(0, 1)).fillna(0)
+        elif name == 'same_dist_win_rate':
+            features[name] = dist_win_rate
+        elif name == 'dist_specialization_ratio':
+            features[name] = (dist_win_rate / global_win_rate.replace(0, 1)).fillna(0)
+
+    # 4. Restore Index
+    features = features.reindex(df.index)
+
     return features
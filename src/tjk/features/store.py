@@ -0,0 +1,241 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from tjk.config import settings
+from tjk.features.registry import FAMILIES, family_inputs
+
+try:
+    import pyarrow  # noqa: F401  (parquet engine)
+except ImportError:  # Optional: pip install pyarrow (features are then computed on every call)
+    pyarrow = None
+
+# Bump when the on-disk layout changes (invalidates every family)
+STORE_FORMAT = 1
+
+
+def _feature_modules(func) -> List[str]:
+    """The family's module plus the tjk.features modules it imports from (e.g. expanding)."""
+    module = sys.modules[func.__module__]
+    names = {module.__name__}
+    for value in vars(module).values():
+        name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+        if isinstance(name, str) and name.startswith('tjk.features.'):
+            names.add(name)
+    return sorted(names)
+
+
+def family_version(family: str) -> str:
+    """Hash of the source of the modules implementing the family: any code change there = new version."""
+    func = FAMILIES[family].func
+    source = "".join(inspect.getsource(sys.modules[name]) for name in _feature_modules(func))
+    return hashlib.sha1(f"{STORE_FORMAT}:{source}".encode()).hexdigest()[:12]
+
+
+def month_fingerprint(frame: pd.DataFrame) -> str:
+    """
+    Order-sensitive hash of a month's rows (all columns and their dtypes).
+    Values are hashed as float64 / int64 / str so equal rows hash equally
+    whatever the dtype; the dtypes are hashed separately because families
+    may carry them into their outputs.
+    """
+    normalized = {}
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.astype('datetime64[ns]').astype('int64')
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = values.astype('float64')
+        else:
+            values = values.astype(str)
+        normalized[col] = values
+    hashed = pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).values
+    digest = hashlib.sha1(repr([(c, str(t)) for c, t in frame.dtypes.items()]).encode())
+    digest.update(hashed.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _state_digest(state) -> str:
+    # Only used to tell "end state unchanged" (stop recomputing later months);
+    # a false "changed" just costs a recompute.
+    return hashlib.sha1(pickle.dumps(state, protocol=4)).hexdigest()[:16]
+
+
+class FeatureStore:
+    """
+    Persisted feature rows per family and year-month, with the running state
+    (rolling tails, expanding counts) at the end of each month:
+        {root}/manifest.json
+        {root}/{family}/{version}/month=YYYY-MM/features.parquet   (id + feature columns)
+        {root}/{family}/{version}/month=YYYY-MM/state.pkl          (state after the month)
+    version = family_version(): changing a family's code rebuilds that family only.
+    A month is recomputed when its rows changed (month_fingerprint of the
+    family's input columns, so loading more or fewer columns is free) or, for
+    stateful families, when the state it starts from changed; recomputing
+    resumes from the previous month's state, so a new race day only computes
+    the current month. Features are causal (earlier dates only), so a month's
+    rows never depend on later months.
+    """
+    def __init__(self, root: Path = None):
+        self.root = Path(root or settings.FEATURE_STORE_DIR)
+        self.manifest_path = self.root / "manifest.json"
+
+    @property
+    def available(self) -> bool:
+        return pyarrow is not None
+
+    def _month_dir(self, family: str, version: str, ym: str) -> Path:
+        return self.root / family / version / f"month={ym}"
+
+    def load_manifest(self) -> dict:
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"families": {}}
+
+    def _save_manifest(self, manifest: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def _load_state(self, family: str, version: str, ym: Optional[str]):
+        if ym is None:
+            return {}
+        with open(self._month_dir(family, version, ym) / "state.pkl", "rb") as f:
+            return pickle.load(f)
+
+    def _write_month(self, family: str, version: str, ym: str, rows: pd.DataFrame, state):
+        path = self._month_dir(family, version, ym)
+        path.mkdir(parents=True, exist_ok=True)
+        rows.to_parquet(path / "features.parquet.tmp", index=False, compression="zstd")
+        os.replace(path / "features.parquet.tmp", path / "features.parquet")
+        with open(path / "state.pkl.tmp", "wb") as f:
+            pickle.dump(state, f, protocol=4)
+        os.replace(path / "state.pkl.tmp", path / "state.pkl")
+
+    @staticmethod
+    def _compute(family: str, chunk: pd.DataFrame, state) -> pd.DataFrame:
+        """Runs a family on one month (all its columns). Returns id + feature columns."""
+        spec = FAMILIES[family]
+        # Stateless families are recomputed per month from that month's rows only
+        features = spec.func(chunk, state=state) if spec.stateful else spec.func(chunk)
+        return pd.concat([chunk[['id']], features], axis=1)
+
+    def update(self, df: pd.DataFrame, families: Optional[List[str]] = None) -> dict:
+        """
+        Brings `families` (default: all) up to date with `df` (the normalized raw
+        frame of build_features_for_dataset: full history, needs `id`, `date`
+        and family_inputs() of the families).
+        Returns {family: {"computed": [...], "reused": n, "removed": [...]}}.
+        """
+        months = df['date'].dt.strftime('%Y-%m')
+        chunks = {ym: idx for ym, idx in df.groupby(months, sort=True).groups.items()}
+
+        manifest = self.load_manifest()
+        summary = {}
+        for family in families or FAMILIES:
+            stateful = FAMILIES[family].stateful
+            version = family_version(family)
+            inputs = ['id'] + [c for c in family_inputs(family) if c != 'id']
+            fingerprints = {ym: month_fingerprint(df.loc[idx, inputs]) for ym, idx in chunks.items()}
+            entry = manifest["families"].get(family)
+            if entry is None or entry.get("version") != version:
+                shutil.rmtree(self.root / family, ignore_errors=True)  # Older code versions
+                entry = {"version": version, "months": {}}
+            stored = entry["months"]
+            removed = sorted(ym for ym in stored if ym not in chunks)
+
+            computed, months_out = [], {}
+            state, state_from = None, None   # In-memory state, or the month to load it from
+            state_changed = False
+            pending_removal = removed[0] if removed else None
+            for ym in sorted(chunks):
+                old = stored.get(ym)
+                if pending_removal is not None and pending_removal < ym:
+                    # A dropped earlier month: the state this month starts from changed
+                    state_changed, pending_removal = True, None
+                fresh = (
+                    old is not None and old["fingerprint"] == fingerprints[ym]
+                    and not (stateful and state_changed)
+                    and (self._month_dir(family, version, ym) / "features.parquet").exists()
+                )
+                if fresh:
+                    months_out[ym] = old
+                    state, state_from = None, ym
+                    continue
+
+                if state is None and stateful:
+                    state = self._load_state(family, version, state_from)
+                rows = self._compute(family, df.loc[chunks[ym]], state)
+                self._write_month(family, version, ym, rows, state)
+                digest = _state_digest(state)
+                state_changed = old is None or old.get("state") != digest
+                months_out[ym] = {
+                    "fingerprint": fingerprints[ym],
+                    "rows": len(rows),
+                    "state": digest,
+                    "written_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                computed.append(ym)
+                state_from = ym
+
+            for ym in removed:
+                shutil.rmtree(self._month_dir(family, version, ym), ignore_errors=True)
+            entry["months"] = months_out
+            manifest["families"][family] = entry
+            summary[family] = {"computed": computed, "reused": len(chunks) - len(computed), "removed": removed}
+
+        self._save_manifest(manifest)
+        return summary
+
+    def read(self, df: pd.DataFrame, families: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """Stored features of `families` (default: all) aligned to df.index (joined on `id`)."""
+        manifest = self.load_manifest()
+        out = {}
+        for family in families or FAMILIES:
+            entry = manifest["families"][family]
+            frames = [
+                pd.read_parquet(self._month_dir(family, entry["version"], ym) / "features.parquet")
+                for ym in sorted(entry["months"])
+            ]
+            rows = pd.concat(frames, ignore_index=True).set_index('id')
+            aligned = rows.reindex(df['id'].values)
+            aligned.index = df.index
+            out[family] = aligned
+        return out
+
+    def features(self, df: pd.DataFrame, families: Optional[List[str]] = None):
+        """update() + read(); prints what had to be computed."""
+        summary = self.update(df, families)
+        for family, s in summary.items():
+            computed = s["computed"]
+            span = f" ({computed[0]}..{computed[-1]})" if computed else ""
+            print(f"  > Feature store {family}: {len(computed)} month(s) computed{span}, {s['reused']} reused.")
+        return self.read(df, families)
+
+
+def sync_feature_store() -> Optional[dict]:
+    """Post-scrape hook: computes features for the months the scrape changed."""
+    if not settings.FEATURE_STORE_ENABLED:
+        return None
+    store = FeatureStore()
+    if not store.available:
+        print("⚠️ pyarrow not installed, feature store skipped.")
+        return None
+
+    from tjk.features.builder import load_normalized_data
+    summary = store.update(load_normalized_data())
+    computed = sum(len(s["computed"]) for s in summary.values())
+    print(f"🧮 Feature store: {computed} family-month(s) computed, "
+          f"{sum(s['reused'] for s in summary.values())} reused.")
+    return summary
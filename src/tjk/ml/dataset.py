@@ -1,6 +1,10 @@
 import pandas as pd
 from sqlalchemy import text
-from tjk.storage.db import get_db
+from tjk.config import settings
+from tjk.storage.db import read_session
+from tjk.storage.duck import DuckAnalytics
+from tjk.storage.facts import facts_lookback_sql, facts_select_sql
+from tjk.storage.warehouse import ParquetWarehouse, raw_columns
 
 # Central Column Mapping
 # DB Column -> ML Feature Name
@@ -22,66 +26,141 @@ COLUMN_MAPPING = {
     'finish_time': 'finish_time',
 }
 
+# Race order: every read sorts on these (DB names)
+ORDER_COLUMNS = ['race_date', 'city', 'race_no', 'id']
+
 def inspect_db():
     """Reads all tables and prints columns/types to help build the mapping."""
-    db = next(get_db())
-    print("\n🧐 INSPECTING DATABASE SCHEMA...\n")
+    with read_session() as db:
+        print("\n🧐 INSPECTING DATABASE SCHEMA...\n")
     
-    tables = ['races', 'entries', 'horses']
+        tables = ['races', 'entries', 'horses']
     
-    for t_name in tables:
-        print(f"--- TABLE: {t_name.upper()} ---")
-        try:
-            # Get columns info
-            cols = db.execute(text(f"PRAGMA table_info({t_name})")).fetchall()
-            # cid, name, type, notnull, dflt_value, pk
-            for c in cols:
-                print(f"  - {c[1]:<15} ({c[2]})")
+        for t_name in tables:
+            print(f"--- TABLE: {t_name.upper()} ---")
+            try:
+                # Get columns info
+                cols = db.execute(text(f"PRAGMA table_info({t_name})")).fetchall()
+                # cid, name, type, notnull, dflt_value, pk
+                for c in cols:
+                    print(f"  - {c[1]:<15} ({c[2]})")
                 
-            # Count rows
-            count = db.execute(text(f"SELECT count(*) FROM {t_name}")).scalar()
-            print(f"  > ROW COUNT: {count}")
+                # Count rows
+                count = db.execute(text(f"SELECT count(*) FROM {t_name}")).scalar()
+                print(f"  > ROW COUNT: {count}")
             
-            # Sample data
-            print(f"  > SAMPLE:")
-            df = pd.read_sql(text(f"SELECT * FROM {t_name} LIMIT 3"), db.connection())
-            print(df.to_string(index=False))
-            print("\n")
+                # Sample data
+                print(f"  > SAMPLE:")
+                df = pd.read_sql(text(f"SELECT * FROM {t_name} LIMIT 3"), db.connection())
+                print(df.to_string(index=False))
+                print("\n")
             
-        except Exception as e:
-            print(f"  ERROR: {e}\n")
+            except Exception as e:
+                print(f"  ERROR: {e}\n")
 
-def load_raw_data(start_date=None, end_date=None):
+def load_raw_data(start_date=None, end_date=None, columns=None, lookback=0):
     """
     Loads raw data joining Races + Entries.
+    Reads the Parquet mirror (tjk.storage.warehouse) when it is fresh for the
+    requested months, otherwise the entry_facts table (no join) in SQLite.
+    With ANALYTICS_ENGINE=duckdb the same sources are queried through DuckDB.
+    `columns` limits the loaded columns
+    (DB names, see warehouse.raw_columns()).
+    lookback: with a start_date, also the earlier races of the horses running
+    in the range (rows dated before start_date, for history features): the
+    last N per horse, None = their whole career, 0 = none.
     Leakage Warning: This returns RAW data. Feature engineering must handle dates carefully.
     """
-    db = next(get_db())
-    
-    query = """
-    SELECT 
-        r.date as race_date, r.city, r.race_no, r.surface, r.distance_m,
-        e.* 
-    FROM entries e
-    JOIN races r ON e.race_id = r.race_id
+    chunks = list(iter_raw_data(start_date, end_date, columns, lookback))
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+def iter_raw_data(start_date=None, end_date=None, columns=None, lookback=0, chunk_rows=None):
+    """
+    load_raw_data as a stream of DataFrames in race order: up to `chunk_rows`
+    rows each (default settings.LOADER_CHUNK_ROWS) from SQLite / DuckDB, one
+    per month file from the warehouse. Yields at least one (maybe empty) frame.
     """
+    history = bool(start_date) and lookback != 0
+    if columns is not None and history:
+        # The lookback reads order and partition on these
+        columns = list(dict.fromkeys(ORDER_COLUMNS + ['horse_name'] + list(columns)))
+    
+    total = prior = 0
+    with read_session() as db:
+        for chunk in _iter_raw_data(db, start_date, end_date, columns, lookback, chunk_rows or settings.LOADER_CHUNK_ROWS):
+            total += len(chunk)
+            if history:
+                prior += int((chunk['race_date'] < pd.Timestamp(start_date)).sum())
+            yield chunk
+    
+    if total == 0:
+        yield pd.DataFrame(columns=columns or raw_columns())
+    print(f"✅ Loaded {total} rows." + (f" ({prior} earlier rows for the lookback)" if history else ""))
+
+def _iter_raw_data(db, start_date, end_date, columns, lookback, chunk_rows):
+    history = bool(start_date) and lookback != 0
+    warehouse = ParquetWarehouse()
+    stale = None
+    if settings.WAREHOUSE_ENABLED and warehouse.available:
+        # Lookback rows can come from any earlier month
+        stale = warehouse.stale_months(db.connection(), None if history else start_date, end_date)
+    
+    if settings.ANALYTICS_ENGINE == "duckdb":
+        duck = DuckAnalytics(source="sqlite" if stale or stale is None else "parquet", warehouse=warehouse)
+        try:
+            print(f"⏳ Loading data with DuckDB/{duck.source} ({start_date} to {end_date})...")
+            chunks = duck.iter_raw(start_date, end_date, columns, lookback, chunk_rows)
+            first = next(chunks, None)  # Runs the query: failures up to here fall back
+        except Exception as e:
+            duck.close()
+            print(f"⚠️ DuckDB unavailable ({str(e).splitlines()[0]}), falling back.")
+        else:
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            finally:
+                duck.close()
+            return
+    
+    if stale == []:
+        print(f"⏳ Loading data from warehouse ({start_date} to {end_date})...")
+        if not history:
+            yield from warehouse.iter_read(start_date, end_date, columns)
+            return
+        # Range first (its horses pick the earlier rows), earlier rows yielded first
+        target = warehouse.read(start_date, end_date, columns)
+        horses = target['horse_name'].dropna().unique().tolist()
+        if horses:
+            earlier = warehouse.read(None, start_date, columns, horses=horses)
+            earlier = earlier[earlier['race_date'] < pd.Timestamp(start_date)]
+            if lookback is not None:
+                earlier = earlier.groupby('horse_name', sort=False).tail(lookback)
+            yield earlier.reset_index(drop=True)
+        yield target
+        return
+    if stale:
+        print(f"⚠️ Warehouse stale for {len(stale)} month(s) ({stale[0]}..{stale[-1]}), reading SQLite.")
     
     # Simple date filter if provided
     params = {}
     where = []
     if start_date:
-        where.append("r.date >= :start")
-        params['start'] = start_date
+        where.append("race_date >= :start")
+        params['start'] = str(start_date)
     if end_date:
-        where.append("r.date <= :end")
-        params['end'] = end_date
-        
-    if where:
-        query += " WHERE " + " AND ".join(where)
-        
-    query += " ORDER BY r.date, r.city, r.race_no"
+        where.append("race_date <= :end")
+        params['end'] = str(end_date)
+    
+    columns = columns or raw_columns()
+    if history:
+        query = facts_lookback_sql(columns, " AND ".join(where), "race_date < :start", lookback)
+    else:
+        query = facts_select_sql(columns, where=("WHERE " + " AND ".join(where)) if where else "")
     
     print(f"⏳ Loading data from DB ({start_date} to {end_date})...")
-    df = pd.read_sql(text(query), db.connection(), params=params)
-    print(f"✅ Loaded {len(df)} rows.")
-    return df
+    for chunk in pd.read_sql(text(query), db.connection(), params=params, chunksize=chunk_rows):
+        # Same dtype as the warehouse path
+        if 'race_date' in chunk.columns:
+            chunk['race_date'] = pd.to_datetime(chunk['race_date'])
+        yield chunk
@@ -5,7 +5,7 @@ import os
 import json
 from sklearn.metrics import roc_auc_score, log_loss
 from tjk.features.builder import build_features_for_dataset
-from tjk.ml.train import train_xgboost_model, FEATURE_COLS
+from tjk.ml.train import train_xgboost_model, FEATURE_COLS, LABEL_COLS
 
 OUTPUT_DIR = "outputs"
 DAILY_REPORTS_DIR = "outputs/daily_reports"
@@ -102,7 +102,7 @@ def calculate_feature_importance():
     Trains a fresh model on ALL data to extract global feature importance.
     """
     print("⏳ Training standard model for Feature Importance...")
-    df = build_features_for_dataset() # Load full history
+    df = build_features_for_dataset(columns=FEATURE_COLS + LABEL_COLS) # Load full history
     model = train_xgboost_model(df)
     
     importance = model.get_booster().get_score(importance_type='gain')
@@ -18,6 +18,9 @@ FEATURE_COLS = [
 
 TARGET_COL = 'is_top3' # Or is_win
 
+# Raw columns the trainers read besides FEATURE_COLS (targets, surprise label)
+LABEL_COLS = ['rank', 'agf']
+
 def train_baseline_model(train_df):
     """
     Simple Logistic Regression Baseline.
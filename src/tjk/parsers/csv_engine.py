@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from ..models.race import Race, Entry, SurfaceType
+from ..utils.debug import debug_capture
+
+SURFACES = {'Kum': SurfaceType.KUM, 'Sentetik': SurfaceType.SENTETIK, 'Çim': SurfaceType.CIM}
+
+
+class CsvRow:
+    """
+    One split CSV line plus the column plan of the current table.
+    `get(name)` is a dict lookup + bounds check, no per-row header resolution.
+    """
+    __slots__ = ('parts', 'plan', 'width')
+
+    def __init__(self, parts: List[str], plan: Dict[str, Optional[int]]):
+        self.parts = parts
+        self.plan = plan
+        self.width = len(parts)
+
+    def get(self, col_name: str) -> str:
+        idx = self.plan.get(col_name)
+        if idx is not None and idx < self.width:
+            return self.parts[idx]
+        return ""
+
+
+@dataclass
+class CsvFormatSpec:
+    """
+    Describes one TJK CSV format for TableCsvParser.
+    - columns: fallback column indices, used when a name is missing from the header row
+    - build_entry: (row, race) -> Entry or None (skipped row)
+    - finalize: (race, entries) -> ordered entries (e.g. time-based ranking)
+    - keep_empty_races: keep races that ended up with no entries
+    """
+    name: str
+    columns: Dict[str, int]
+    build_entry: Callable[[CsvRow, Race], Optional[Entry]]
+    finalize: Optional[Callable[[Race, List[Entry]], List[Entry]]] = None
+    keep_empty_races: bool = True
+    error_label: str = "entry"
+
+
+class TableCsvParser:
+    """
+    Shared state machine for TJK ';' separated CSVs:
+    race header line -> column header row -> entry rows -> next race header.
+    The column plan is resolved once per header row and reused for every entry row.
+    """
+    spec: CsvFormatSpec = None
+
+    def __init__(self, spec: CsvFormatSpec = None):
+        if spec is not None:
+            self.spec = spec
+        self.races = []
+        self.current_race = None
+        self.current_race_entries = []
+        self.headers = {}
+        self.plan = self._resolve_plan({})
+
+    def _resolve_plan(self, headers: Dict[str, int]) -> Dict[str, Optional[int]]:
+        plan = dict(self.spec.columns)
+        for name in plan:
+            idx = headers.get(name)
+            if idx is not None:
+                plan[name] = idx
+        return plan
+
+    def parse_csv(self, csv_content: str, date_obj: date, city: str) -> List[Race]:
+        lines = csv_content.splitlines()
+        debug_capture.log(f"CSV Lines: {len(lines)}")
+
+        self.races = []
+        self.current_race = None
+        self.current_race_entries = []
+        self.headers = {}
+        self.plan = self._resolve_plan({})
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            # Remove BOM if present
+            if line.startswith('\ufeff'):
+                line = line[1:]
+
+            parts = [p.strip() for p in line.split(';')]
+            first = parts[0]
+
+            # Detect Race Header (e.g., "1. Kosu : 18.30;...")
+            if ("Kosu" in first or "Koşu" in first) and ":" in first:
+                debug_capture.log(f"Found Race Header: {first}")
+                if self.current_race:
+                    self._finalize_current_race()
+                self._parse_race_header(parts, date_obj, city)
+                continue
+
+            # Detect Column Headers (e.g., "At No;At İsmi;...")
+            if "At No" in parts and "At İsmi" in parts:
+                self.headers = {name: i for i, name in enumerate(parts)}
+                self.plan = self._resolve_plan(self.headers)
+                continue
+
+            # Parse Entry Row
+            if self.current_race and len(parts) > 2 and first.isdigit():
+                self._parse_entry(parts, line)
+
+        # Finalize last race
+        if self.current_race:
+            self._finalize_current_race()
+
+        return self.races
+
+    def _parse_race_header(self, parts: List[str], date_obj: date, city: str):
+        # Format: 1. Kosu : 17.45;Maiden;...;1400m;Kum
+        race_no_str = parts[0].split('.')[0].strip()
+
+        distance = 0
+        surface = SurfaceType.KUM
+
+        for p in parts:
+            if p.endswith('m') and p[:-1].isdigit():
+                distance = int(p[:-1])
+            if p in SURFACES:
+                surface = SURFACES[p]
+
+        self.current_race = Race(
+            race_id=f"{date_obj.isoformat()}_{city}_{race_no_str}",
+            date=date_obj,
+            city=city,
+            race_no=int(race_no_str),
+            distance_m=distance,
+            surface=surface,
+            entries=[]
+        )
+        self.current_race_entries = []
+
+    def _finalize_current_race(self):
+        race, entries = self.current_race, self.current_race_entries
+        self.current_race = None
+        self.current_race_entries = []
+
+        if not race or (not entries and not self.spec.keep_empty_races):
+            return
+
+        if self.spec.finalize:
+            entries = self.spec.finalize(race, entries)
+        race.entries = entries
+        self.races.append(race)
+
+    def _parse_entry(self, parts: List[str], line: str):
+        try:
+            entry = self.spec.build_entry(CsvRow(parts, self.plan), self.current_race)
+            if entry is not None:
+                self.current_race_entries.append(entry)
+        except Exception as e:
+            debug_capture.log(f"Error parsing {self.spec.error_label}: {e}")
+            debug_capture.capture(f"{self.spec.name}_row", self.current_race.race_id,
+                                  f"Error parsing {self.spec.error_label}: {e}\n{line}", failure=True)
+
+
+def rank_by_finish_time(race: Race, entries: List[Entry]) -> List[Entry]:
+    """
+    Results finalizer: ranks entries with a valid time ("1:23.45") in time order,
+    entries without a time keep rank None and go last.
+    """
+    valid_entries = [e for e in entries if e.finish_time and ':' in e.finish_time]
+    no_time_entries = [e for e in entries if not (e.finish_time and ':' in e.finish_time)]
+
+    # Simple Sort by time string (e.g. "1:23.45" < "1:24.00")
+    valid_entries.sort(key=lambda x: x.finish_time)
+
+    for i, entry in enumerate(valid_entries):
+        entry.rank = i + 1
+
+    return valid_entries + no_time_entries
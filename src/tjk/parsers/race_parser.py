@@ -2,6 +2,7 @@ from selectolax.parser import HTMLParser
 from typing import Optional
 from ..models.race import Race, Entry, SurfaceType
 from .utils import normalize_text, parse_int, parse_float
+from ..utils.debug import debug_capture
 
 class RaceParser:
     def parse_race_detail(self, html: str, race_stub: dict) -> Race:
@@ -39,18 +40,17 @@ class RaceParser:
     def _parse_entries(self, tree: HTMLParser, race_id: str) -> list[Entry]:
         entries = []
         # Find the main table
-        with open("debug_race.html", "w", encoding="utf-8") as f:
-            f.write(tree.html)
-            
         table = tree.css_first('table.tablesorter')
         if not table:
-            print("DEBUG: Table 'table.tablesorter' NOT found in HTML.")
-            # print(f"DEBUG: HTML snippet: {tree.html[:500]}")
+            debug_capture.log("Table 'table.tablesorter' NOT found in HTML.")
+            debug_capture.capture("race_html", race_id, lambda: tree.html, failure=True, ext=".html")
             return []
             
-        print(f"DEBUG: Table found with {len(table.css('tbody tr'))} rows.")
+        rows = table.css('tbody tr')
+        debug_capture.log(f"Table found with {len(rows)} rows.")
+        debug_capture.capture("race_html", race_id, lambda: tree.html, ext=".html")
             
-        for row in table.css('tbody tr'):
+        for row in rows:
             cells = row.css('td')
             if len(cells) < 5:
                 continue
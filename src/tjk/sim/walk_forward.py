@@ -6,10 +6,11 @@ import logging
 from datetime import timedelta, date
 from typing import List, Optional
 
-from tjk.features.builder import build_features_for_dataset
+from tjk.features.builder import build_features_for_dataset, raw_ml_columns
+from tjk.features.dtypes import frame_memory_mb
 from tjk.ml.train import (
     train_place_model, train_win_model, train_sp_model, 
-    predict_with_model, FEATURE_COLS
+    predict_with_model, FEATURE_COLS, LABEL_COLS
 )
 from tjk.decision.weighting import calculate_dynamic_score
 from tjk.decision.risk import classify_race_risk
@@ -28,6 +29,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TJKSimulator")
 
+# The daily outputs keep every raw column (finish_time, saddle_no...): only the
+# computed features are narrowed to FEATURE_COLS, the raw load is not projected
+REPORT_COLS = raw_ml_columns()
+
 class DailySimulator:
     def __init__(self, start_date: str, end_date: str, train_window: str = "all", resume: bool = False):
         self.start_date = pd.to_datetime(start_date).date()
@@ -42,10 +47,16 @@ class DailySimulator:
         self.state_file = f"{self.output_dir}/state.json"
         
         # Load Data ONCE (InMemory optimization, but filter carefully)
-        logger.info("Loading full dataset...")
-        self.full_df = build_features_for_dataset()
+        # Up to end_date; from the first training day with a day window
+        # (history features still see the earlier races they need)
+        try:
+            first_day = self.start_date - timedelta(days=int(self.train_window))
+        except (TypeError, ValueError):
+            first_day = None  # 'all': train on the whole history
+        logger.info(f"Loading dataset ({first_day or 'start'} to {self.end_date})...")
+        self.full_df = build_features_for_dataset(first_day, self.end_date, columns=list(dict.fromkeys(FEATURE_COLS + LABEL_COLS + REPORT_COLS)))
         self.full_df['date'] = pd.to_datetime(self.full_df['date'])
-        logger.info(f"Loaded {len(self.full_df)} rows.")
+        logger.info(f"Loaded {len(self.full_df)} rows ({frame_memory_mb(self.full_df):.1f} MB).")
 
     def get_state(self):
         if self.resume and os.path.exists(self.state_file):
@@ -158,19 +169,18 @@ class DailySimulator:
         
         # Risk Scoring (Race-wise)
         race_risk_list = []
-        # Group by City+RaceNo unique key for the day
-        for (city, race_no), group in results.groupby(['city', 'race_no']):
+        # Group by race_key (int, unique per date+city+race_no)
+        for race_key, group in results.groupby('race_key'):
             risk = classify_race_risk(group, win_col='model_win')
-            risk['city'] = city
-            risk['race_no'] = race_no
+            risk['race_key'] = race_key
             race_risk_list.append(risk)
             
         if race_risk_list:
             risk_df = pd.DataFrame(race_risk_list)
-            results = pd.merge(results, risk_df, on=['city', 'race_no'], how='left')
+            results = pd.merge(results, risk_df, on='race_key', how='left')
         
         # Ranking
-        results['pred_rank'] = results.groupby(['city', 'race_no'])['final_score'].rank(method='first', ascending=False)
+        results['pred_rank'] = results.groupby('race_key')['final_score'].rank(method='first', ascending=False)
         
         # 5. Evaluate (Daily Metrics)
         metrics = self.calculate_daily_metrics(results)
@@ -1,20 +1,181 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
 from ..config import settings
 
 class Base(DeclarativeBase):
     pass
 
-engine = create_engine(settings.DB_URL, echo=False)
+# SQLite PRAGMA profiles (settings.DB_PROFILE), applied on every new connection.
+# default  -> SQLite defaults (rollback journal, synchronous=FULL, ~2 MB page cache)
+# balanced -> WAL: readers don't block the scraper and vice versa; NORMAL sync is
+#             durable against app crashes, may lose the last commit on power loss
+# bulk     -> large backfills; synchronous=OFF trades crash safety for speed
+SQLITE_PROFILES: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,        # KiB (negative = size, not pages)
+        "mmap_size": 268435456,      # 256 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,        # ms, wait for the writer instead of "database is locked"
+    },
+    "bulk": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1073741824,     # 1 GB
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+
+# File level settings a read-only connection can't (and needn't) change
+WRITE_ONLY_PRAGMAS = ("journal_mode", "synchronous")
+
+
+def sqlite_pragmas(profile: str, read_only: bool = False) -> Dict[str, object]:
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}', expected one of {list(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    if read_only:
+        for name in WRITE_ONLY_PRAGMAS:
+            pragmas.pop(name, None)
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def apply_sqlite_profile(target: Engine, profile: str, read_only: bool = False) -> Engine:
+    """Runs the profile PRAGMAs on each new DBAPI connection of a SQLite engine."""
+    if target.dialect.name != "sqlite":
+        return target
+    pragmas = sqlite_pragmas(profile, read_only)
+    if not pragmas:
+        return target
+
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return target
+
+
+def sqlite_file(url: str) -> Optional[Path]:
+    """DB file of a SQLite URL, None for other backends and in-memory DBs."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return Path(parsed.database)
+
+
+def pool_options(url: str) -> Dict[str, object]:
+    """
+    Bounded, thread-safe connection pool for file DBs and server backends:
+    at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections per engine, idle ones
+    stay open (SQLite page cache and mmap stay warm between calls).
+    In-memory SQLite keeps SQLAlchemy's default single-connection pool.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and sqlite_file(url) is None:
+        return {}
+    options = {
+        "poolclass": QueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    if parsed.get_backend_name() == "sqlite":
+        # Pooled connections move between threads (GUI worker, asyncio executors);
+        # a connection is only ever used by one session at a time.
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def create_read_engine(url: str, profile: str) -> Optional[Engine]:
+    """
+    Read-only engine for analytics (dataset loading, profiles, reports).
+    Opens the file with mode=ro, so a long read can never take the write lock;
+    with a WAL profile it also runs alongside an active scraper.
+    Returns None when the URL is not a SQLite file (callers share the main engine).
+    """
+    path = sqlite_file(url)
+    if path is None:
+        return None
+    uri = path.resolve().as_uri() + "?mode=ro"
+
+    options = pool_options(url)
+    options.pop("connect_args", None)  # The creator opens the connection itself
+    read_only = create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+        echo=False,
+        **options,  # QueuePool: "sqlite://" would otherwise get the in-memory pool
+    )
+    return apply_sqlite_profile(read_only, profile, read_only=True)
+
+
+engine = apply_sqlite_profile(
+    create_engine(settings.DB_URL, echo=False, **pool_options(settings.DB_URL)), settings.DB_PROFILE
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+read_engine = create_read_engine(settings.DB_URL, settings.DB_PROFILE) or engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Write session: commits when the block succeeds, rolls back on error,
+    always closes (its connection goes back to the pool).
+        with session_scope() as db:
+            TJKRepository(db).upsert_program_day(races)
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """Session on the read-only analytics engine, closed when the block ends. Any write raises."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def get_db():
+    # Generator form of session_scope without the commit (callers commit)
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def get_read_db():
+    """Session on the read-only analytics engine. Any write raises."""
+    with read_session() as db:
+        yield db
+
 def init_db():
-    from . import schema # Ensure models are loaded
-    Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables together with their new columns and
+    # indexes; apply_schema also upgrades older DB files (see tjk migrate).
+    from .migrate import apply_schema
+    with engine.begin() as conn:
+        apply_schema(conn)
@@ -0,0 +1,97 @@
+from datetime import date
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from .schema import CityKeyModel, HorseKeyModel, JockeyKeyModel, OwnerKeyModel, TrainerKeyModel
+
+# kind -> (dimension model, table holding the natural value, natural column, key column)
+DIMENSIONS = {
+    'horse': (HorseKeyModel, 'entries', 'horse_id', 'horse_key'),
+    'jockey': (JockeyKeyModel, 'entries', 'jockey_name', 'jockey_key'),
+    'trainer': (TrainerKeyModel, 'entries', 'trainer_id', 'trainer_key'),
+    'owner': (OwnerKeyModel, 'entries', 'owner_id', 'owner_key'),
+    'city': (CityKeyModel, 'races', 'city', 'city_key'),
+}
+
+
+# race_key = (date ordinal * 1000 + city_key) * 100 + race_no
+# e.g. 2025-05-05, city 7, race 3 -> 73930600703. Sorts by date, then city, then race.
+CITY_SLOTS = 1000
+RACE_SLOTS = 100
+# SQLite: julianday('0001-01-01') = 1721425.5 and date.toordinal() of that day is 1
+_SQL_ORDINAL = "CAST(julianday({col}) - 1721424.5 AS INTEGER)"
+
+
+def race_key(race_date: date, city_key: Optional[int], race_no: int) -> Optional[int]:
+    if city_key is None or race_no is None:
+        return None
+    if not (0 < city_key < CITY_SLOTS and 0 < race_no < RACE_SLOTS):
+        raise ValueError(f"race_key out of range: city_key={city_key}, race_no={race_no}")
+    return (race_date.toordinal() * CITY_SLOTS + city_key) * RACE_SLOTS + race_no
+
+
+class KeyRegistry:
+    """
+    Natural value -> integer key, per dimension, cached in process.
+    Misses are inserted (INSERT .. ON CONFLICT DO NOTHING) and read back on the
+    caller's session, so they commit or roll back with the rows that use them.
+    Call reset() after a rollback: cached keys may not exist anymore.
+    """
+    def __init__(self):
+        self.known: Dict[str, Dict[str, int]] = {kind: {} for kind in DIMENSIONS}
+
+    def reset(self):
+        for known in self.known.values():
+            known.clear()
+
+    def keys(self, db, kind: str, names: Iterable[Optional[str]]) -> Dict[str, int]:
+        known = self.known[kind]
+        missing = {n for n in names if n and n not in known}
+        if missing:
+            table = DIMENSIONS[kind][0].__table__
+            db.execute(
+                insert(table).on_conflict_do_nothing(index_elements=['name']),
+                [{'name': n} for n in sorted(missing)]  # Stable key order for the same input
+            )
+            rows = db.execute(select(table.c.key, table.c.name).where(table.c.name.in_(missing)))
+            known.update((name, key) for key, name in rows)
+        return known
+
+    def key(self, db, kind: str, name: Optional[str]) -> Optional[int]:
+        if not name:
+            return None
+        return self.keys(db, kind, [name]).get(name)
+
+
+def backfill_keys(conn) -> int:
+    """
+    Assigns keys (and race keys) to rows written before the key columns existed.
+    Returns the number of rows that got a key.
+    """
+    updated = 0
+    for model, table, natural, key_col in DIMENSIONS.values():
+        dim = model.__tablename__
+        pending = f"{key_col} IS NULL AND {natural} IS NOT NULL AND {natural} != ''"
+        conn.execute(text(
+            f"INSERT OR IGNORE INTO {dim} (name) SELECT DISTINCT {natural} FROM {table} WHERE {pending}"
+        ))
+        result = conn.execute(text(
+            f"UPDATE {table} SET {key_col} = (SELECT d.key FROM {dim} d WHERE d.name = {table}.{natural}) "
+            f"WHERE {pending}"
+        ))
+        updated += result.rowcount or 0
+
+    # race_key needs city_key, so after the dimensions
+    ordinal = _SQL_ORDINAL.format(col="date")
+    result = conn.execute(text(
+        f"UPDATE races SET race_key = ({ordinal} * {CITY_SLOTS} + city_key) * {RACE_SLOTS} + race_no "
+        f"WHERE race_key IS NULL AND city_key IS NOT NULL"
+    ))
+    updated += result.rowcount or 0
+    result = conn.execute(text(
+        "UPDATE entries SET race_key = (SELECT r.race_key FROM races r WHERE r.race_id = entries.race_id) "
+        "WHERE race_key IS NULL"
+    ))
+    updated += result.rowcount or 0
+    return updated
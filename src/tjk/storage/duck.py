@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from .db import sqlite_file
+from .facts import facts_lookback_sql
+from .warehouse import ParquetWarehouse, raw_columns
+from .watermark import _as_date
+
+try:
+    import duckdb
+except ImportError:  # Optional: pip install duckdb (SQLite queries are the default)
+    duckdb = None
+
+
+class DuckAnalytics:
+    """
+    Read-only DuckDB query layer (settings.ANALYTICS_ENGINE = "duckdb").
+    Exposes one view, `facts`, with the load_raw_data columns, over either
+    - source="parquet": the Parquet mirror (tjk.storage.warehouse), or
+    - source="sqlite":  the SQLite file attached READ_ONLY (entry_facts) through
+                        DuckDB's sqlite extension (installed on first use).
+    Nothing is copied into DuckDB; the catalog is in-memory.
+    """
+    def __init__(self, source: str = "sqlite", db_url: str = None, warehouse: ParquetWarehouse = None):
+        if source not in ("parquet", "sqlite"):
+            raise ValueError(f"Unknown DuckDB source '{source}'")
+        self.source = source
+        self.db_url = db_url or settings.DB_URL
+        self.warehouse = warehouse or ParquetWarehouse()
+        self._con = None
+
+    @property
+    def available(self) -> bool:
+        return duckdb is not None
+
+    def connect(self):
+        if self._con is not None:
+            return self._con
+        if duckdb is None:
+            raise RuntimeError("duckdb is not installed (pip install duckdb)")
+
+        cols = ", ".join(raw_columns())
+        con = duckdb.connect()
+        try:
+            if self.source == "parquet":
+                files = list((self.warehouse.root / "entries").glob("month=*/part-0.parquet"))
+                if not files:
+                    raise RuntimeError("Parquet mirror is empty, run tjk warehouse-sync")
+                pattern = (self.warehouse.root / "entries" / "*" / "part-0.parquet").as_posix()
+                con.execute(f"CREATE VIEW facts AS SELECT {cols} FROM read_parquet('{pattern}')")
+            else:
+                path = sqlite_file(self.db_url)
+                if path is None:
+                    raise RuntimeError("DuckDB sqlite source needs a SQLite file DB_URL")
+                con.execute("INSTALL sqlite")
+                con.execute("LOAD sqlite")
+                con.execute(f"ATTACH '{path.resolve().as_posix()}' AS tjk (TYPE sqlite, READ_ONLY)")
+                con.execute(f"CREATE VIEW facts AS SELECT {cols} FROM tjk.entry_facts")
+        except Exception:
+            con.close()
+            raise
+        self._con = con
+        return con
+
+    def close(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def load_raw(self, start_date=None, end_date=None, columns: List[str] = None, lookback: Optional[int] = 0):
+        """
+        load_raw_data on DuckDB: same columns, order and date semantics.
+        Converted through Arrow like the warehouse path, so nullable ints come
+        back as float64 with NaN (not pandas' Int16 with pd.NA).
+        """
+        import pandas as pd
+        frames = list(self.iter_raw(start_date, end_date, columns, lookback))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns or raw_columns())
+
+    def iter_raw(self, start_date=None, end_date=None, columns: List[str] = None, lookback: Optional[int] = 0,
+                 chunk_rows: int = None):
+        """
+        load_raw as DataFrames of up to `chunk_rows` rows (default settings.LOADER_CHUNK_ROWS).
+        lookback: with a start date, also the earlier races of the horses in
+            the range: the last N per horse, None = their whole career
+            (facts_lookback_sql). `columns` must then hold the race order columns.
+        """
+        where, params = [], {}
+        if start_date:
+            where.append("race_date >= $start")
+            params["start"] = _as_date(start_date)
+        if end_date:
+            where.append("race_date <= $end")
+            params["end"] = _as_date(end_date)
+        columns = columns or raw_columns()
+        if start_date and lookback != 0:
+            sql = facts_lookback_sql(columns, " AND ".join(where), "race_date < $start", lookback, table="facts")
+        else:
+            sql = (
+                f"SELECT {', '.join(columns)} FROM facts "
+                f"{('WHERE ' + ' AND '.join(where)) if where else ''} "
+                f"ORDER BY race_date, city, race_no, id"
+            )
+        result = self.connect().execute(sql, params)
+        if not self.warehouse.available:
+            yield result.df()
+            return
+        reader = result.fetch_record_batch(chunk_rows or settings.LOADER_CHUNK_ROWS)
+        for batch in reader:
+            yield batch.to_pandas(date_as_object=False)
+
+    # --- Batched aggregates for predict_advanced (one query per kind per day) ---
+
+    def track_history(self, day_entries, limit: int = 5) -> Dict[str, List[int]]:
+        """
+        day_entries: DataFrame(horse_name, surface, distance_m, race_date).
+        Last `limit` ranks per horse on the same surface, distance +/- 200m,
+        before its race date, newest first (get_track_dist_score).
+        """
+        con = self.connect()
+        con.register("day_entries", day_entries)
+        try:
+            rows = con.execute("""
+                SELECT horse_name, rank FROM (
+                    SELECT d.horse_name, f.rank,
+                           ROW_NUMBER() OVER (PARTITION BY d.horse_name ORDER BY f.race_date DESC) AS rn
+                    FROM day_entries d
+                    JOIN facts f ON f.horse_name = d.horse_name
+                    WHERE f.surface = d.surface
+                      AND f.distance_m BETWEEN d.distance_m - 200 AND d.distance_m + 200
+                      AND f.rank IS NOT NULL
+                      AND f.race_date < CAST(d.race_date AS DATE)
+                ) WHERE rn <= ?
+                ORDER BY horse_name, rn
+            """, [limit]).fetchall()
+        finally:
+            con.unregister("day_entries")
+
+        history: Dict[str, List[int]] = {}
+        for name, rank in rows:
+            history.setdefault(name, []).append(rank)
+        return history
+
+    def last_jockeys(self, horse_names: List[str], before) -> Dict[str, str]:
+        """Jockey of each horse's most recent race before `before`."""
+        rows = self.connect().execute("""
+            SELECT horse_name, arg_max(jockey_name, race_date)
+            FROM facts
+            WHERE horse_name IN (SELECT UNNEST(?)) AND race_date < ?
+            GROUP BY horse_name
+        """, [list(horse_names), _as_date(before)]).fetchall()
+        return dict(rows)
+
+    def jockey_stats(self, jockeys: List[str]) -> Dict[str, Tuple[int, int]]:
+        """(wins, rides) per jockey over all stored races."""
+        rows = self.connect().execute("""
+            SELECT jockey_name, COUNT(*) FILTER (WHERE rank = 1), COUNT(*)
+            FROM facts
+            WHERE jockey_name IN (SELECT UNNEST(?))
+            GROUP BY jockey_name
+        """, [list(jockeys)]).fetchall()
+        return {name: (wins, total) for name, wins, total in rows}
+
+    def trainer_wins(self, trainers: List[str]) -> Dict[str, int]:
+        rows = self.connect().execute("""
+            SELECT trainer_id, COUNT(*)
+            FROM facts
+            WHERE rank = 1 AND trainer_id IN (SELECT UNNEST(?))
+            GROUP BY trainer_id
+        """, [list(trainers)]).fetchall()
+        return dict(rows)
+
+
+def open_analytics(db_conn, start_date=None, end_date=None) -> DuckAnalytics:
+    """DuckDB over the Parquet mirror when it is fresh for the range, else over SQLite."""
+    warehouse = ParquetWarehouse()
+    fresh = (
+        settings.WAREHOUSE_ENABLED and warehouse.available
+        and not warehouse.stale_months(db_conn, start_date, end_date)
+    )
+    return DuckAnalytics(source="parquet" if fresh else "sqlite", warehouse=warehouse)
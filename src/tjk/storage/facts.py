@@ -0,0 +1,104 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import bindparam, text
+
+from .schema import EntryFactModel
+
+FACT_COLUMNS = [c.name for c in EntryFactModel.__table__.columns]
+
+# entries/races -> entry_facts. Derived columns:
+#   field_size  runners per race (window count)
+#   finish_s    "m:ss.ff" -> seconds, NULL without a valid time
+#   ganyan_odds "17,73" -> 17.73, NULL when empty
+_FACT_SELECT = """
+SELECT
+    e.id, e.race_id, r.date, r.city, r.race_no, r.surface, r.distance_m,
+    COUNT(*) OVER (PARTITION BY e.race_id),
+    e.horse_id, e.horse_name, e.saddle_no, e.jockey_name, e.weight_kg, e.owner_id,
+    e.trainer_id, e.hp, e.kgs, e.s20, e.agf, e.form_score,
+    e.rank, e.finish_time,
+    CASE WHEN instr(e.finish_time, ':') > 0 THEN
+        CAST(substr(e.finish_time, 1, instr(e.finish_time, ':') - 1) AS REAL) * 60
+        + CAST(substr(e.finish_time, instr(e.finish_time, ':') + 1) AS REAL)
+    END,
+    e.ganyan,
+    CAST(REPLACE(NULLIF(TRIM(e.ganyan), ''), ',', '.') AS REAL),
+    e.equipment,
+    e.horse_key, e.jockey_key, e.trainer_key, e.owner_key, r.city_key, e.race_key
+FROM entries e
+JOIN races r ON e.race_id = r.race_id
+"""
+
+_INSERT = f"INSERT INTO entry_facts ({', '.join(FACT_COLUMNS)}) {_FACT_SELECT}"
+
+
+def refresh_races(db, race_ids: Iterable[str]) -> None:
+    """
+    Rebuilds the facts of the given races. Runs on the caller's session /
+    connection so it commits (or rolls back) together with the entry writes.
+    """
+    race_ids = list(race_ids)
+    if not race_ids:
+        return
+    ids = bindparam("race_ids", expanding=True)
+    db.execute(text("DELETE FROM entry_facts WHERE race_id IN :race_ids").bindparams(ids), {"race_ids": race_ids})
+    db.execute(text(f"{_INSERT} WHERE e.race_id IN :race_ids").bindparams(ids), {"race_ids": race_ids})
+
+
+def rebuild(db, start_date=None, end_date=None) -> int:
+    """Rebuilds the facts of a date range (all dates when open). Caller commits."""
+    where, params = [], {}
+    if start_date:
+        where.append("{col} >= :start")
+        params['start'] = str(start_date)
+    if end_date:
+        where.append("{col} <= :end")
+        params['end'] = str(end_date)
+
+    delete_where = " AND ".join(where).format(col="race_date")
+    insert_where = " AND ".join(where).format(col="r.date")
+    db.execute(text("DELETE FROM entry_facts" + (f" WHERE {delete_where}" if where else "")), params)
+    db.execute(text(_INSERT + (f" WHERE {insert_where}" if where else "")), params)
+    return db.execute(text("SELECT COUNT(*) FROM entry_facts")).scalar()
+
+
+def backfill_if_empty(db) -> Optional[int]:
+    """One-time fill for DB files created before entry_facts existed."""
+    if db.execute(text("SELECT 1 FROM entry_facts LIMIT 1")).first():
+        return None
+    if not db.execute(text("SELECT 1 FROM entries LIMIT 1")).first():
+        return None
+    return rebuild(db)
+
+
+def facts_select_sql(columns: List[str] = None, where: str = "") -> str:
+    """entry_facts with only `columns` selected, in race order (no join)."""
+    return (
+        f"SELECT {', '.join(columns or FACT_COLUMNS)} FROM entry_facts "
+        f"{where} ORDER BY race_date, city, race_no, id"
+    )
+
+
+def facts_lookback_sql(columns: List[str], where: str, before: str, lookback: Optional[int],
+                       table: str = "entry_facts") -> str:
+    """
+    facts_select_sql for a date range plus the earlier races of the horses
+    running in it: the last `lookback` per horse (None = their whole career).
+    `where` is the range condition, `before` the one for earlier rows
+    (e.g. "race_date < :start"). `columns` must hold the race order columns.
+    Served by ix_facts_horse_date: only the horses' own rows are read.
+    """
+    cols = ', '.join(columns)
+    prior = f"{before} AND horse_name IN (SELECT horse_name FROM {table} WHERE {where})"
+    if lookback is None:
+        history = f"SELECT {cols} FROM {table} WHERE {prior}"
+    else:
+        history = (
+            f"SELECT {cols} FROM ("
+            f"SELECT {cols}, ROW_NUMBER() OVER ("
+            f"PARTITION BY horse_name ORDER BY race_date DESC, city DESC, race_no DESC, id DESC) AS prior_no "
+            f"FROM {table} WHERE {prior}) WHERE prior_no <= {int(lookback)}"
+        )
+    return (
+        f"SELECT {cols} FROM {table} WHERE {where} "
+        f"UNION ALL {history} ORDER BY race_date, city, race_no, id"
+    )
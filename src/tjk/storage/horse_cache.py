@@ -0,0 +1,53 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .schema import HorseModel
+
+# horse_id -> (sire, dam, birth_year)
+KnownHorse = Tuple[Optional[str], Optional[str], Optional[int]]
+
+
+class HorseCache:
+    """
+    In-process copy of the horse dimension, preloaded once per scrape run.
+    Lets the bulk program upsert write only new horses or horses whose
+    sire/dam/birth_year were unknown and are now learned.
+    """
+    def __init__(self):
+        self.known: Dict[str, KnownHorse] = {}
+        self.loaded = False
+
+    def preload(self, db: Session) -> "HorseCache":
+        rows = db.execute(select(
+            HorseModel.horse_id, HorseModel.sire, HorseModel.dam, HorseModel.birth_year
+        )).all()
+        self.known = {r[0]: (r[1], r[2], r[3]) for r in rows}
+        self.loaded = True
+        return self
+
+    def changes(self, horse_rows: Iterable[dict]) -> List[dict]:
+        """Rows that would change the horses table (new horse or newly learned field)."""
+        pending = []
+        for row in horse_rows:
+            known = self.known.get(row['horse_id'])
+            if known is None:
+                pending.append(row)
+                continue
+            sire, dam, birth_year = known
+            if (row['sire'] and not sire) or (row['dam'] and not dam) or (row['birth_year'] and not birth_year):
+                pending.append(row)
+        return pending
+
+    def remember(self, horse_rows: Iterable[dict]):
+        """Call after the rows were committed; merges them with the same fill-missing rule as the DB."""
+        for row in horse_rows:
+            known = self.known.get(row['horse_id'])
+            if known is None:
+                self.known[row['horse_id']] = (row['sire'], row['dam'], row['birth_year'])
+            else:
+                sire, dam, birth_year = known
+                self.known[row['horse_id']] = (
+                    sire or row['sire'] or sire,
+                    dam or row['dam'] or dam,
+                    birth_year or row['birth_year'] or birth_year,
+                )
@@ -0,0 +1,143 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from .db import Base, engine as default_engine
+from .dimensions import backfill_keys
+from .facts import backfill_if_empty, rebuild as rebuild_facts
+
+# Main access paths, used to show query plans before/after a migration.
+# name -> (sql, params)
+ACCESS_PATHS: Dict[str, Tuple[str, dict]] = {
+    "race_day (DecisionEngine, coupon)": (
+        "SELECT * FROM races WHERE date = :d AND city = :c ORDER BY race_no",
+        {"d": "2025-12-19", "c": "İzmir"},
+    ),
+    "race_entries (race.entries)": (
+        "SELECT * FROM entries WHERE race_id = :r",
+        {"r": "2025-12-19_İzmir_1"},
+    ),
+    "result_match (update_day_results)": (
+        "UPDATE entries SET rank = 1 WHERE race_id = :r AND horse_id = :h",
+        {"r": "2025-12-19_İzmir_1", "h": "X"},
+    ),
+    "date_range (HistoryProcessor)": (
+        "SELECT * FROM races WHERE date >= :s AND date < :e ORDER BY date",
+        {"s": "2025-05-05", "e": "2025-12-19"},
+    ),
+    "dataset_join (load_raw_data)": (
+        "SELECT r.date, r.city, r.race_no, e.* FROM entries e JOIN races r ON e.race_id = r.race_id "
+        "WHERE r.date >= :s AND r.date <= :e ORDER BY r.date, r.city, r.race_no",
+        {"s": "2025-05-05", "e": "2025-12-19"},
+    ),
+    "horse_history (predict_advanced)": (
+        "SELECT e.rank FROM entries e JOIN races r ON e.race_id = r.race_id "
+        "WHERE e.horse_name = :h AND r.surface = :s AND r.distance_m BETWEEN :a AND :b "
+        "AND e.rank IS NOT NULL AND r.date < :d ORDER BY r.date DESC LIMIT 5",
+        {"h": "X", "s": "Kum", "a": 1200, "b": 1600, "d": "2025-12-19"},
+    ),
+    "jockey_stats (predict_advanced)": (
+        "SELECT COUNT(CASE WHEN rank = 1 THEN 1 END), COUNT(*) FROM entries WHERE jockey_name = :j",
+        {"j": "X"},
+    ),
+    "trainer_wins (predict_advanced)": (
+        "SELECT COUNT(*) FROM entries WHERE trainer_id = :t AND rank = 1",
+        {"t": "X"},
+    ),
+}
+
+
+def query_plans(conn: Connection) -> Dict[str, List[str]]:
+    plans = {}
+    for name, (sql, params) in ACCESS_PATHS.items():
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+        plans[name] = [r[-1] for r in rows]
+    return plans
+
+
+def add_missing_columns(conn: Connection) -> List[str]:
+    """
+    Adds model columns that older DB files don't have yet (ALTER TABLE .. ADD COLUMN).
+    Only nullable, non-key columns can be added this way, which is all we need.
+    """
+    added = []
+    insp = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c['name'] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            col_type = col.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{col.name}" {col_type}'))
+            added.append(f"{table.name}.{col.name}")
+    return added
+
+
+def create_missing_indexes(conn: Connection) -> List[str]:
+    created = []
+    insp = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {ix['name'] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+                created.append(index.name)
+    return created
+
+
+def apply_schema(conn: Connection) -> dict:
+    """
+    Brings an existing SQLite DB up to the current schema (init_db, tjk migrate):
+    1. create missing tables, 2. add missing columns, 3. create missing indexes,
+    4. assign surrogate keys to older rows, 5. (re)fill entry_facts when it is
+    new, got new columns or its source rows got keys.
+    """
+    from . import schema  # noqa: F401  Ensure models are loaded
+
+    Base.metadata.create_all(bind=conn)
+    added = add_missing_columns(conn)
+    created = create_missing_indexes(conn)
+    keyed = backfill_keys(conn)
+
+    if keyed or any(c.startswith("entry_facts.") for c in added):
+        facts_rows = rebuild_facts(conn)
+    else:
+        facts_rows = backfill_if_empty(conn)
+
+    return {"columns_added": added, "indexes_created": created, "keys_assigned": keyed, "facts_rows": facts_rows}
+
+
+def run_migrations(bind: Engine = None, show_plans: bool = True) -> dict:
+    """
+    apply_schema() + ANALYZE so the planner has statistics.
+    Prints query plans before/after.
+    """
+    bind = bind or default_engine
+
+    with bind.begin() as conn:
+        before = query_plans(conn) if show_plans and inspect(conn).has_table("entries") else {}
+
+        result = apply_schema(conn)
+        conn.execute(text("ANALYZE"))
+
+        after = query_plans(conn) if show_plans else {}
+
+    print("🛠️ MIGRATION")
+    print(f"  > Columns added: {result['columns_added'] or 'none'}")
+    print(f"  > Indexes created: {result['indexes_created'] or 'none'}")
+    print(f"  > Surrogate keys assigned: {result['keys_assigned']} rows")
+    if result['facts_rows'] is not None:
+        print(f"  > entry_facts rebuilt: {result['facts_rows']} rows")
+    print("  > ANALYZE done.")
+
+    if show_plans:
+        print("\n📋 QUERY PLANS (before -> after)")
+        for name in after:
+            print(f"\n  {name}")
+            for line in before.get(name, ["(no table)"]):
+                print(f"    before: {line}")
+            for line in after[name]:
+                print(f"    after:  {line}")
+
+    return {**result, "plans_before": before, "plans_after": after}
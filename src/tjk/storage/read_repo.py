@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field, fields
+from datetime import date
+from typing import Iterable, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .schema import EntryModel, RaceModel
+
+
+@dataclass(slots=True)
+class EntryRow:
+    """Plain copy of an `entries` row (no session, no lazy loading)."""
+    id: int
+    race_id: str
+    horse_id: str
+    horse_name: str
+    saddle_no: Optional[int] = None
+    jockey_name: Optional[str] = None
+    weight_kg: Optional[float] = None
+    owner_id: Optional[str] = None
+    trainer_id: Optional[str] = None
+    hp: Optional[int] = None
+    kgs: Optional[int] = None
+    s20: Optional[int] = None
+    agf: Optional[float] = None
+    form_score: Optional[str] = None
+    rank: Optional[int] = None
+    finish_time: Optional[str] = None
+    ganyan: Optional[str] = None
+    equipment: Optional[str] = None
+    horse_key: Optional[int] = None
+    jockey_key: Optional[int] = None
+    trainer_key: Optional[int] = None
+    owner_key: Optional[int] = None
+    race_key: Optional[int] = None
+
+
+@dataclass(slots=True)
+class RaceRow:
+    """Plain copy of a `races` row with its entries already attached."""
+    race_id: str
+    date: date
+    city: str
+    race_no: int
+    distance_m: Optional[int] = None
+    surface: Optional[str] = None
+    city_key: Optional[int] = None
+    race_key: Optional[int] = None
+    entries: List[EntryRow] = field(default_factory=list)
+
+
+_RACE_COLUMNS = [f.name for f in fields(RaceRow) if f.name != 'entries']
+_ENTRY_COLUMNS = [f.name for f in fields(EntryRow)]
+
+
+class RaceReadRepository:
+    """
+    Read side for race-day consumers (DecisionEngine, backtest, coupon, exports).
+    Every method is one races LEFT JOIN entries query grouped into RaceRow /
+    EntryRow objects, instead of a lazy `race.entries` SELECT per race.
+    Rows are ordered by date, city, race_no and entries by id (program order).
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def races_for_day(self, race_date: date, cities: Iterable[str] = None,
+                      race_nos: Iterable[int] = None) -> List[RaceRow]:
+        races = RaceModel.__table__
+        conditions = [races.c.date == race_date]
+        if cities is not None:
+            conditions.append(races.c.city.in_(list(cities)))
+        if race_nos is not None:
+            conditions.append(races.c.race_no.in_(list(race_nos)))
+        return self._load(conditions)
+
+    def races_between(self, start_date: date = None, end_date: date = None,
+                      cities: Iterable[str] = None) -> List[RaceRow]:
+        """Races with start_date <= date <= end_date (open ends = no limit)."""
+        races = RaceModel.__table__
+        conditions = []
+        if start_date is not None:
+            conditions.append(races.c.date >= start_date)
+        if end_date is not None:
+            conditions.append(races.c.date <= end_date)
+        if cities is not None:
+            conditions.append(races.c.city.in_(list(cities)))
+        return self._load(conditions)
+
+    def _load(self, conditions) -> List[RaceRow]:
+        races = RaceModel.__table__
+        entries = EntryModel.__table__
+        stmt = (
+            select(*[races.c[c] for c in _RACE_COLUMNS], *[entries.c[c] for c in _ENTRY_COLUMNS])
+            .select_from(races.outerjoin(entries, entries.c.race_id == races.c.race_id))
+            .where(*conditions)
+            .order_by(races.c.date, races.c.city, races.c.race_no, entries.c.id)
+        )
+
+        n_race = len(_RACE_COLUMNS)
+        result: List[RaceRow] = []
+        current = None
+        for row in self.db.execute(stmt):
+            if current is None or current.race_id != row[0]:
+                current = RaceRow(*row[:n_race])
+                result.append(current)
+            if row[n_race] is not None:  # Race without entries (outer join)
+                current.entries.append(EntryRow(*row[n_race:]))
+        return result
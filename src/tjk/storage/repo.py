@@ -1,97 +1,341 @@
+import hashlib
+import json
+from typing import Dict, List, Optional
+from datetime import date
+from sqlalchemy import bindparam, delete, func, select, update
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.sqlite import insert
 from .schema import RaceModel, EntryModel, HorseModel
-from ..models.race import Race
+from .horse_cache import HorseCache
+from .dimensions import DIMENSIONS, KeyRegistry, race_key
+from . import facts
+from ..models.race import Race, Entry
 from ..models.horse import HorseProfile
+from ..models.enums import Gender
+from ..utils.debug import debug_capture
+
+# Program fields written to `entries` (results columns stay NULL until update_race_results)
+PROGRAM_ENTRY_FIELDS = (
+    'horse_id', 'horse_name', 'saddle_no', 'jockey_name', 'weight_kg', 'owner_id',
+    'trainer_id', 'hp', 'kgs', 's20', 'agf', 'form_score', 'equipment'
+)
+# Surrogate key columns of `entries`, derived from the program fields at upsert
+ENTRY_KEY_FIELDS = tuple(key for _, table, _, key in DIMENSIONS.values() if table == 'entries') + ('race_key',)
+
+def birth_year_from_age(age_text: Optional[str], race_date: date) -> Optional[int]:
+    # "4y d a" -> 4 -> 2025 - 4 = 2021
+    if not age_text:
+        return None
+    try:
+        return race_date.year - int(age_text.split('y')[0])
+    except: 
+        return None
+
+def horse_row_from_entry(entry: Entry, race_date: date) -> dict:
+    """Horse dimension row built from a program entry (pedigree rides in _temp_horse_info)."""
+    temp_info = getattr(entry, '_temp_horse_info', {})
+    return {
+        'horse_id': entry.horse_id,
+        'name': entry.horse_name,
+        'gender': Gender.UNKNOWN.value,
+        'sire': temp_info.get('sire'),
+        'dam': temp_info.get('dam'),
+        'birth_year': birth_year_from_age(temp_info.get('age_text'), race_date),
+    }
+
+def program_hash(race: Race) -> str:
+    """
+    Fingerprint of a race's normalized program data: race context, entries
+    (program fields + pedigree) in a stable order. Results are not part of it,
+    so update_day_results never makes a race look changed.
+    """
+    entries = sorted(
+        [
+            [getattr(entry, f) for f in PROGRAM_ENTRY_FIELDS]
+            + [horse_row_from_entry(entry, race.date)[k] for k in ('sire', 'dam', 'birth_year')]
+            for entry in race.entries
+        ],
+        key=repr
+    )
+    payload = [race.date.isoformat(), race.city, race.race_no, race.distance_m, race.surface.value, entries]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False, default=str).encode()).hexdigest()[:16]
+
+def _fill_missing(current, incoming):
+    # Keep a known value, otherwise take a non-empty incoming one (upsert_horse semantics)
+    return func.coalesce(func.nullif(current, ''), func.nullif(incoming, ''), current)
 
 class TJKRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, horse_cache: Optional[HorseCache] = None):
         self.db = db
+        # Optional known-horse cache: bulk upserts then skip unchanged horses
+        self.horse_cache = horse_cache
+        # Integer surrogate keys (horse/jockey/trainer/owner/city)
+        self.keys = KeyRegistry()
 
-    def upsert_program_race(self, race: Race):
-        # 1. Race Upsert
-        existing_race = self.db.query(RaceModel).filter(RaceModel.race_id == race.race_id).first()
-        if existing_race:
-            self.db.delete(existing_race)
-            self.db.commit()
-            
-        db_race = RaceModel(
-            race_id=race.race_id,
-            date=race.date,
-            city=race.city,
-            race_no=race.race_no,
-            distance_m=race.distance_m,
-            surface=race.surface.value
+    def _assign_keys(self, race_rows: List[dict], entry_rows: List[dict]):
+        """Adds the *_key and race_key columns to race/entry rows, creating missing keys."""
+        for kind, (_, table, natural, key_col) in DIMENSIONS.items():
+            rows = race_rows if table == 'races' else entry_rows
+            keys = self.keys.keys(self.db, kind, {row[natural] for row in rows})
+            for row in rows:
+                row[key_col] = keys.get(row[natural])
+
+        race_keys = {}
+        for row in race_rows:
+            row['race_key'] = race_keys[row['race_id']] = race_key(row['date'], row['city_key'], row['race_no'])
+        for row in entry_rows:
+            row['race_key'] = race_keys[row['race_id']]
+
+    def upsert_program_day(self, races: List[Race]) -> dict:
+        """
+        Bulk program upsert for one city-day in a single transaction.
+        Races whose program_hash matches the stored content_hash are skipped
+        entirely; an unchanged re-scrape (hourly race-day refresh) writes nothing.
+        Changed races are updated in place: races via INSERT .. ON CONFLICT,
+        entries diffed on (race_id, horse_id) -> UPDATE changed rows by id,
+        INSERT new ones, DELETE scratched ones. Entry ids and stored results
+        survive a program refresh. Horses via INSERT .. ON CONFLICT that only
+        fills missing pedigree/birth year; with a horse cache only new horses /
+        newly learned fields are written.
+        entry_facts of the changed races are refreshed in the same transaction.
+        Returns counts for logging.
+        """
+        if not races:
+            return {'races': 0, 'entries': 0, 'deleted': 0, 'horses': 0, 'unchanged': 0}
+
+        hashes = {race.race_id: program_hash(race) for race in races}
+        stored = dict(self.db.execute(
+            select(RaceModel.race_id, RaceModel.content_hash).where(RaceModel.race_id.in_(list(hashes)))
+        ).all())
+        changed = [race for race in races if stored.get(race.race_id) != hashes[race.race_id]]
+        if not changed:
+            self.db.commit()  # Ends the read transaction, nothing to write
+            return {'races': 0, 'entries': 0, 'deleted': 0, 'horses': 0, 'unchanged': len(races)}
+
+        race_rows = []
+        entry_rows = []
+        horse_rows: Dict[str, dict] = {}
+
+        for race in changed:
+            race_rows.append({
+                'race_id': race.race_id,
+                'date': race.date,
+                'city': race.city,
+                'race_no': race.race_no,
+                'distance_m': race.distance_m,
+                'surface': race.surface.value,
+                'content_hash': hashes[race.race_id],
+            })
+            for entry in race.entries:
+                row = {f: getattr(entry, f) for f in PROGRAM_ENTRY_FIELDS}
+                row['race_id'] = race.race_id
+                entry_rows.append(row)
+
+                horse = horse_row_from_entry(entry, race.date)
+                known = horse_rows.get(horse['horse_id'])
+                if known is None:
+                    horse_rows[horse['horse_id']] = horse
+                else:
+                    for k in ('sire', 'dam', 'birth_year'):
+                        if not known[k] and horse[k]: known[k] = horse[k]
+
+        race_ids = [r['race_id'] for r in race_rows]
+
+        horse_writes = list(horse_rows.values())
+        if self.horse_cache is not None and self.horse_cache.loaded:
+            horse_writes = self.horse_cache.changes(horse_writes)
+
+        race_stmt = insert(RaceModel.__table__)
+        race_stmt = race_stmt.on_conflict_do_update(
+            index_elements=['race_id'],
+            set_={
+                c: race_stmt.excluded[c]
+                for c in ('date', 'city', 'race_no', 'distance_m', 'surface', 'city_key', 'race_key', 'content_hash')
+            }
         )
-        self.db.add(db_race)
-        self.db.commit()
-        
-        # 2. Entries Upsert
-        for entry in race.entries:
-            # Handle Horse Profile Updates (Pedigree, Age->BirthYear)
-            temp_info = getattr(entry, '_temp_horse_info', {})
-            birth_year = None
-            if temp_info.get('age_text'):
-                try:
-                    # "4y d a" -> 4 -> 2025 - 4 = 2021
-                    age_str = temp_info['age_text'].split('y')[0]
-                    age = int(age_str)
-                    birth_year = race.date.year - age
-                except: pass
-                
-            horse_profile = HorseProfile(
-                horse_id=entry.horse_id,
-                name=entry.horse_name,
-                sire=temp_info.get('sire'),
-                dam=temp_info.get('dam'),
-                birth_year=birth_year,
-                # gender argument omitted, uses default Gender.UNKNOWN
-            )
-            self.upsert_horse(horse_profile)
-
-            # Insert Entry
-            db_entry = EntryModel(
-                race_id=race.race_id,
-                horse_id=entry.horse_id,
-                horse_name=entry.horse_name,
-                saddle_no=entry.saddle_no,
-                jockey_name=entry.jockey_name,
-                weight_kg=entry.weight_kg,
-                owner_id=entry.owner_id,
-                trainer_id=entry.trainer_id,
-                hp=entry.hp,
-                kgs=entry.kgs,
-                s20=entry.s20,
-                agf=entry.agf,
-                form_score=entry.form_score,
-                equipment=entry.equipment
-                # Rank/Time are Null initially
+
+        horses = HorseModel.__table__
+        horse_stmt = insert(horses)
+        horse_stmt = horse_stmt.on_conflict_do_update(
+            index_elements=['horse_id'],
+            set_={
+                'sire': _fill_missing(horses.c.sire, horse_stmt.excluded.sire),
+                'dam': _fill_missing(horses.c.dam, horse_stmt.excluded.dam),
+                'birth_year': func.coalesce(
+                    func.nullif(horses.c.birth_year, 0), func.nullif(horse_stmt.excluded.birth_year, 0), horses.c.birth_year
+                ),
+            }
+        )
+
+        try:
+            self._assign_keys(race_rows, entry_rows)
+            self.db.execute(race_stmt, race_rows)
+            written, deleted = self._apply_entry_diff(race_ids, entry_rows)
+            self._bump_data_version(race_ids)
+            if horse_writes:
+                self.db.execute(horse_stmt, horse_writes)
+            facts.refresh_races(self.db, race_ids)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            self.keys.reset()
+            raise
+
+        if self.horse_cache is not None and self.horse_cache.loaded:
+            self.horse_cache.remember(horse_writes)
+
+        return {
+            'races': len(race_rows), 'entries': written, 'deleted': deleted,
+            'horses': len(horse_writes), 'unchanged': len(races) - len(changed),
+        }
+
+    def _apply_entry_diff(self, race_ids: List[str], entry_rows: List[dict]):
+        """
+        Brings the stored entries of `race_ids` to `entry_rows` (program fields
+        and keys only, results columns are never touched).
+        Returns (rows inserted or updated, rows deleted).
+        """
+        entries = EntryModel.__table__
+        compared = PROGRAM_ENTRY_FIELDS + ENTRY_KEY_FIELDS
+
+        existing = {}
+        delete_ids = []
+        rows = self.db.execute(
+            select(entries.c.id, entries.c.race_id, entries.c.horse_id, entries.c.rank, entries.c.finish_time,
+                   *[entries.c[f] for f in compared])
+            .where(entries.c.race_id.in_(race_ids))
+        ).mappings()
+        for row in rows:
+            key = (row['race_id'], row['horse_id'])
+            if key in existing:
+                delete_ids.append(row['id'])  # Duplicate left by an older re-scrape
+            else:
+                existing[key] = row
+
+        inserts, updates = [], []
+        for row in entry_rows:
+            current = existing.pop((row['race_id'], row['horse_id']), None)
+            if current is None:
+                inserts.append(row)
+                continue
+            if current['rank'] is not None or current['finish_time']:
+                # The results CSV may have set equipment (update_day_results), keep it
+                row['equipment'] = current['equipment']
+            if any(row[f] != current[f] for f in compared):
+                updates.append({'b_id': current['id'], **{f'b_{f}': row[f] for f in compared}})
+        # Left over: no longer in the program (scratched)
+        delete_ids.extend(row['id'] for row in existing.values())
+
+        if delete_ids:
+            self.db.execute(delete(entries).where(entries.c.id.in_(delete_ids)))
+        if updates:
+            self.db.execute(
+                update(entries)
+                .where(entries.c.id == bindparam('b_id'))
+                .values({f: bindparam(f'b_{f}') for f in compared}),
+                updates
             )
-            self.db.add(db_entry)
-        self.db.commit()
+        if inserts:
+            self.db.execute(insert(entries), inserts)
+        return len(inserts) + len(updates), len(delete_ids)
+
+    def _bump_data_version(self, race_ids):
+        """
+        Marks the races' entries as rewritten. In-place updates keep ids and can
+        keep every aggregate of the month watermark (a jockey name edit), the
+        version sum still moves.
+        """
+        races = RaceModel.__table__
+        self.db.execute(
+            update(races)
+            .where(races.c.race_id.in_(list(race_ids)))
+            .values(data_version=func.coalesce(races.c.data_version, 0) + 1)
+        )
+
+    def upsert_program_race(self, race: Race) -> dict:
+        """Single-race program upsert (same hash check and in-place diff as upsert_program_day)."""
+        return self.upsert_program_day([race])
 
     def update_race_results(self, race: Race):
         # Only update Rank, Time, Ganyan, Equipment for existing entries
-        for entry in race.entries:
-            # Find matching entry by ID (preferred) or Name
-            db_entry = self.db.query(EntryModel).filter(
-                EntryModel.race_id == race.race_id,
-                EntryModel.horse_id == entry.horse_id
-            ).first()
-            
-            if db_entry:
-                db_entry.rank = entry.rank
-                db_entry.finish_time = entry.finish_time
-                db_entry.ganyan = entry.ganyan
-                # Update equipment if provided in results (might differ from program)
-                if entry.equipment:
-                    db_entry.equipment = entry.equipment
-            else:
-                # Fallback: If entry wasn't in program (rare late entry?), insert it?
-                # For now, just log or skip.
-                print(f"Warning: Result entry {entry.horse_name} not found in program entries.")
-                pass
-        self.db.commit()
+        return self.update_day_results([race])
+
+    def update_day_results(self, races: List[Race]) -> dict:
+        """
+        Applies results (rank, finish_time, ganyan, equipment) for a city-day:
+        one SELECT to resolve which (race_id, horse_id) exist and their current
+        results, then one executemany UPDATE keyed on the (race_id, horse_id)
+        index for the rows whose results differ, one commit. Unmatched result
+        rows are reported in a single summary line. Only races with a changed
+        row get their data_version bumped and entry_facts refreshed, so
+        re-applying the same results writes nothing.
+        """
+        race_ids = [r.race_id for r in races]
+        if not race_ids:
+            return {'updated': 0, 'unmatched': 0}
+
+        existing = {
+            (race_id, horse_id): results
+            for race_id, horse_id, *results in self.db.execute(
+                select(
+                    EntryModel.race_id, EntryModel.horse_id,
+                    EntryModel.rank, EntryModel.finish_time, EntryModel.ganyan, EntryModel.equipment,
+                ).where(EntryModel.race_id.in_(race_ids))
+            ).all()
+        }
+
+        params = []
+        unmatched = []
+        for race in races:
+            for entry in race.entries:
+                if (race.race_id, entry.horse_id) not in existing:
+                    # Late entry not in program? Not inserted for now, just reported.
+                    unmatched.append(f"K{race.race_no} {entry.horse_name}")
+                    continue
+                rank, finish_time, ganyan, equipment = existing[(race.race_id, entry.horse_id)]
+                if (entry.rank, entry.finish_time, entry.ganyan, entry.equipment or equipment) == (
+                    rank, finish_time, ganyan, equipment
+                ):
+                    continue  # Same results already stored
+                params.append({
+                    'b_race_id': race.race_id,
+                    'b_horse_id': entry.horse_id,
+                    'b_rank': entry.rank,
+                    'b_finish_time': entry.finish_time,
+                    'b_ganyan': entry.ganyan,
+                    # Equipment only overrides the program value if the results CSV has one
+                    'b_equipment': entry.equipment or None,
+                })
+
+        entries = EntryModel.__table__
+        stmt = (
+            update(entries)
+            .where(entries.c.race_id == bindparam('b_race_id'), entries.c.horse_id == bindparam('b_horse_id'))
+            .values(
+                rank=bindparam('b_rank'),
+                finish_time=bindparam('b_finish_time'),
+                ganyan=bindparam('b_ganyan'),
+                equipment=func.coalesce(bindparam('b_equipment'), entries.c.equipment),
+            )
+        )
+
+        try:
+            if params:
+                self.db.execute(stmt, params)
+                updated = {p['b_race_id'] for p in params}
+                self._bump_data_version(updated)
+                facts.refresh_races(self.db, updated)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        if unmatched:
+            print(f"Warning: {len(unmatched)} result entries not found in program entries: {', '.join(unmatched)}")
+        for name in unmatched:
+            debug_capture.log(f"Result entry {name} not found in program entries.")
+
+        return {'updated': len(params), 'unmatched': len(unmatched)}
 
     def upsert_horse(self, horse: HorseProfile):
         existing = self.db.query(HorseModel).filter(HorseModel.horse_id == horse.horse_id).first()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Date, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Date, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -11,7 +11,17 @@ class RaceModel(Base):
     race_no = Column(Integer, nullable=False)
     distance_m = Column(Integer)
     surface = Column(String)
+    city_key = Column(Integer)  # dim_city.key
+    race_key = Column(BigInteger)  # dimensions.race_key(date, city_key, race_no)
+    content_hash = Column(String)  # repo.program_hash of the last program upsert
+    data_version = Column(Integer)  # Bumped by every entry write of the race (month watermark)
     entries = relationship("EntryModel", back_populates="race", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Race-day lookups (date, city) and date range scans (leading column)
+        Index("ix_races_date_city_no", "date", "city", "race_no"),
+        Index("ix_races_race_key", "race_key", unique=True),
+    )
 
 class EntryModel(Base):
     __tablename__ = "entries"
@@ -37,7 +47,27 @@ class EntryModel(Base):
     ganyan = Column(String, nullable=True) # "3.45"
     equipment = Column(String, nullable=True)
     
+    # Integer surrogate keys (dim_* tables), assigned at ingest
+    horse_key = Column(Integer)
+    jockey_key = Column(Integer)
+    trainer_key = Column(Integer)
+    owner_key = Column(Integer)
+    race_key = Column(BigInteger)  # Copy of races.race_key, int join/group key
+    
     race = relationship("RaceModel", back_populates="entries")
+    
+    __table_args__ = (
+        # update_day_results matches result rows on (race_id, horse_id);
+        # the leading race_id also serves every races JOIN entries
+        Index("ix_entries_race_horse", "race_id", "horse_id"),
+        # Per-horse history (predict_advanced, profiles by name)
+        Index("ix_entries_horse_name", "horse_name"),
+        # Jockey / trainer aggregates filter on the name and read rank only
+        Index("ix_entries_jockey_rank", "jockey_name", "rank"),
+        Index("ix_entries_trainer_rank", "trainer_id", "rank"),
+        Index("ix_entries_horse_key", "horse_key"),
+        Index("ix_entries_race_key", "race_key"),
+    )
 
 class HorseModel(Base):
     __tablename__ = "horses"
@@ -48,3 +78,81 @@ class HorseModel(Base):
     sire = Column(String)
     dam = Column(String)
     birth_year = Column(Integer) # Derived from '4y da' -> 2025 - 4 = 2021
+
+class _KeyDimension:
+    """
+    Integer surrogate key for a string identity (name / normalized id).
+    Keys are assigned at ingest (tjk.storage.dimensions) and never reused.
+    """
+    key = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+
+class HorseKeyModel(_KeyDimension, Base):
+    __tablename__ = "dim_horse"      # name = entries.horse_id
+
+class JockeyKeyModel(_KeyDimension, Base):
+    __tablename__ = "dim_jockey"     # name = entries.jockey_name
+
+class TrainerKeyModel(_KeyDimension, Base):
+    __tablename__ = "dim_trainer"    # name = entries.trainer_id
+
+class OwnerKeyModel(_KeyDimension, Base):
+    __tablename__ = "dim_owner"      # name = entries.owner_id
+
+class CityKeyModel(_KeyDimension, Base):
+    __tablename__ = "dim_city"       # name = races.city
+
+class EntryFactModel(Base):
+    """
+    Denormalized races JOIN entries, one row per entry (id = entries.id).
+    Carries the race context, field size and typed results so analytic reads
+    need no join. Maintained by tjk.storage.facts inside the repository writes.
+    Column names match the raw dataset (load_raw_data), plus derived columns.
+    """
+    __tablename__ = "entry_facts"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    race_id = Column(String, nullable=False)
+    race_date = Column(Date, nullable=False)
+    city = Column(String, nullable=False)
+    race_no = Column(Integer, nullable=False)
+    surface = Column(String)
+    distance_m = Column(Integer)
+    field_size = Column(Integer)  # Runners in the race
+    
+    horse_id = Column(String, nullable=False)
+    horse_name = Column(String, nullable=False)
+    saddle_no = Column(Integer)
+    jockey_name = Column(String)
+    weight_kg = Column(Float)
+    owner_id = Column(String)
+    trainer_id = Column(String)
+    hp = Column(Integer)
+    kgs = Column(Integer)
+    s20 = Column(Integer)
+    agf = Column(Float)
+    form_score = Column(String)
+    
+    rank = Column(Integer)
+    finish_time = Column(String)
+    finish_s = Column(Float)      # "1:27.46" -> 87.46
+    ganyan = Column(String)
+    ganyan_odds = Column(Float)   # "17,73" -> 17.73
+    equipment = Column(String)
+    
+    horse_key = Column(Integer)
+    jockey_key = Column(Integer)
+    trainer_key = Column(Integer)
+    owner_key = Column(Integer)
+    city_key = Column(Integer)
+    race_key = Column(BigInteger)
+    
+    __table_args__ = (
+        Index("ix_facts_date_city_no", "race_date", "city", "race_no"),
+        Index("ix_facts_race", "race_id"),
+        Index("ix_facts_horse_date", "horse_name", "race_date"),
+        Index("ix_facts_jockey_date", "jockey_name", "race_date"),
+        Index("ix_facts_trainer_date", "trainer_id", "race_date"),
+        Index("ix_facts_horse_key_date", "horse_key", "race_date"),
+        Index("ix_facts_race_key", "race_key"),
+    )
@@ -0,0 +1,224 @@
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from sqlalchemy import BigInteger, Float, Integer, text
+from sqlalchemy.engine import Connection
+
+from ..config import settings
+from .schema import EntryModel, RaceModel
+from .watermark import _as_date, month_start, month_watermarks, next_month
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: pip install pyarrow (SQLite stays the source of truth)
+    pa = None
+    pq = None
+
+# Race context joined onto every entry: output name -> SQL expression
+RACE_COLUMNS = {
+    'race_date': 'r.date',
+    'city': 'r.city',
+    'race_no': 'r.race_no',
+    'surface': 'r.surface',
+    'distance_m': 'r.distance_m',
+    'city_key': 'r.city_key',
+}
+
+# Integer columns that fit int16 (everything else Integer -> int32/int64)
+SMALL_INT_COLUMNS = {'race_no', 'distance_m', 'saddle_no', 'hp', 's20', 'rank'}
+
+
+def raw_columns() -> List[str]:
+    """Columns of the raw races JOIN entries frame, in load_raw_data order."""
+    return list(RACE_COLUMNS) + [c.name for c in EntryModel.__table__.columns]
+
+
+def raw_select_sql(columns: List[str] = None, where: str = "") -> str:
+    """races JOIN entries with only `columns` selected (None = all raw columns)."""
+    exprs = []
+    for name in columns or raw_columns():
+        if name in RACE_COLUMNS:
+            exprs.append(f"{RACE_COLUMNS[name]} AS {name}")
+        else:
+            exprs.append(f"e.{name}")
+    return (
+        f"SELECT {', '.join(exprs)} FROM entries e JOIN races r ON e.race_id = r.race_id "
+        f"{where} ORDER BY r.date, r.city, r.race_no, e.id"
+    )
+
+
+def _arrow_type(name: str):
+    if name == 'race_date':
+        return pa.date32()
+    if name in RACE_COLUMNS:
+        col = RaceModel.__table__.columns[RACE_COLUMNS[name].split('.')[1]]
+    else:
+        col = EntryModel.__table__.columns[name]
+    if isinstance(col.type, Integer):
+        if name in SMALL_INT_COLUMNS:
+            return pa.int16()
+        return pa.int64() if col.primary_key or isinstance(col.type, BigInteger) else pa.int32()
+    if isinstance(col.type, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def _month_key(d: date) -> str:
+    return d.strftime('%Y-%m')
+
+
+class ParquetWarehouse:
+    """
+    Columnar mirror of races JOIN entries, one Parquet file per year-month:
+        {root}/entries/month=YYYY-MM/part-0.parquet
+        {root}/manifest.json   {"columns": [...], "months": {ym: {"watermark", "rows", "written_at"}}}
+    SQLite stays the source of truth. sync() rewrites only the months whose
+    watermark (tjk.storage.watermark) changed since the last sync.
+    """
+    def __init__(self, root: Path = None):
+        self.root = Path(root or settings.WAREHOUSE_DIR)
+        self.manifest_path = self.root / "manifest.json"
+
+    @property
+    def available(self) -> bool:
+        return pa is not None
+
+    def month_path(self, ym: str) -> Path:
+        return self.root / "entries" / f"month={ym}" / "part-0.parquet"
+
+    def load_manifest(self) -> dict:
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"columns": raw_columns(), "months": {}}
+        # Schema changed since the last sync -> every month is stale
+        if manifest.get("columns") != raw_columns():
+            return {"columns": raw_columns(), "months": {}}
+        return manifest
+
+    def _save_manifest(self, manifest: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def _read_month(self, conn: Connection, ym: str):
+        first = date.fromisoformat(f"{ym}-01")
+        sql = raw_select_sql(where="WHERE r.date >= :m_start AND r.date < :m_end")
+        rows = conn.execute(text(sql), {
+            'm_start': first.isoformat(), 'm_end': next_month(first).isoformat()
+        }).fetchall()
+
+        names = raw_columns()
+        values = list(zip(*rows)) if rows else [()] * len(names)
+        arrays = []
+        for name, col in zip(names, values):
+            if name == 'race_date':
+                col = [_as_date(v) for v in col]
+            arrays.append(pa.array(col, type=_arrow_type(name)))
+        return pa.Table.from_arrays(arrays, names=names)
+
+    def _write_month(self, ym: str, table):
+        path = self.month_path(ym)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    def sync(self, conn: Connection, full: bool = False) -> dict:
+        """Rewrites changed/new months, drops months that left the DB."""
+        manifest = self.load_manifest()
+        months = {} if full else manifest["months"]
+
+        # Watermarks first, rows second: a write landing in between makes the
+        # month look stale on the next check (safe), never falsely fresh.
+        marks = month_watermarks(conn)
+
+        written = [ym for ym, mark in marks.items() if months.get(ym, {}).get("watermark") != mark]
+        removed = [ym for ym in manifest["months"] if ym not in marks]
+
+        for ym in written:
+            table = self._read_month(conn, ym)
+            self._write_month(ym, table)
+            months[ym] = {
+                "watermark": marks[ym],
+                "rows": table.num_rows,
+                "written_at": datetime.now().isoformat(timespec="seconds"),
+            }
+        for ym in removed:
+            self.month_path(ym).unlink(missing_ok=True)
+            months.pop(ym, None)
+
+        self._save_manifest({"columns": raw_columns(), "months": months})
+        return {"written": written, "removed": removed, "unchanged": len(marks) - len(written)}
+
+    def _months_in_range(self, months: Dict[str, dict], start_date=None, end_date=None) -> List[str]:
+        lo = _month_key(month_start(start_date)) if start_date else None
+        hi = _month_key(end_date) if end_date else None
+        return sorted(ym for ym in months if (lo is None or ym >= lo) and (hi is None or ym <= hi))
+
+    def stale_months(self, conn: Connection, start_date=None, end_date=None) -> List[str]:
+        """Months overlapping the range whose mirror is missing, outdated or orphaned."""
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        marks = month_watermarks(conn, start_date, end_date)
+        months = self.load_manifest()["months"]
+        stale = {ym for ym, mark in marks.items() if months.get(ym, {}).get("watermark") != mark}
+        stale.update(ym for ym in self._months_in_range(months, start_date, end_date) if ym not in marks)
+        stale.update(ym for ym in marks if not self.month_path(ym).exists())
+        return sorted(stale)
+
+    def _tables(self, start_date=None, end_date=None, columns: List[str] = None, horses: List[str] = None):
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        filters = []
+        if start_date:
+            filters.append(('race_date', '>=', start_date))
+        if end_date:
+            filters.append(('race_date', '<=', end_date))
+        if horses is not None:
+            filters.append(('horse_name', 'in', list(horses)))
+
+        months = self.load_manifest()["months"]
+        for ym in self._months_in_range(months, start_date, end_date):
+            yield pq.read_table(self.month_path(ym), columns=columns, filters=filters or None)
+
+    def read(self, start_date=None, end_date=None, columns: List[str] = None, horses: List[str] = None):
+        """
+        Reads the mirror with month pruning (only overlapping files are opened),
+        row-group/date filtering and column projection. horses: only these
+        horse_name rows.
+        """
+        import pandas as pd
+
+        columns = list(columns) if columns else raw_columns()
+        tables = list(self._tables(start_date, end_date, columns, horses))
+        if not tables:
+            return pd.DataFrame(columns=columns)
+        return pa.concat_tables(tables).to_pandas(date_as_object=False)
+
+    def iter_read(self, start_date=None, end_date=None, columns: List[str] = None, horses: List[str] = None):
+        """read() one month file at a time (DataFrame per month)."""
+        columns = list(columns) if columns else raw_columns()
+        for table in self._tables(start_date, end_date, columns, horses):
+            yield table.to_pandas(date_as_object=False)
+
+
+def sync_warehouse(full: bool = False) -> Optional[dict]:
+    """Post-scrape hook: brings the Parquet mirror up to date (no-op when disabled)."""
+    if not settings.WAREHOUSE_ENABLED:
+        return None
+    warehouse = ParquetWarehouse()
+    if not warehouse.available:
+        print("⚠️ pyarrow not installed, Parquet warehouse skipped.")
+        return None
+
+    from .db import read_engine
+    with read_engine.connect() as conn:
+        result = warehouse.sync(conn, full=full)
+    print(
+        f"📦 Warehouse: {len(result['written'])} month(s) written, "
+        f"{result['unchanged']} unchanged, {len(result['removed'])} removed."
+    )
+    return result
@@ -0,0 +1,76 @@
+import hashlib
+from datetime import date
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Cheap per-month change detector over races JOIN entries.
+# Program and results writes update entries in place (ids are kept) and bump
+# races.data_version of every race they touch, so any edit moves the version
+# sum, including ones that leave every other aggregate unchanged (a jockey or
+# trainer name, a same-length ganyan correction). New / scratched entries move
+# the counts and max id, a race context fix the distance/surface aggregates.
+# One indexed aggregate scan instead of reading the rows themselves. Float columns are summed as scaled integers:
+# a float TOTAL depends on row order, which changes with the query plan (range
+# filtered vs full scan) and would make a fresh month look stale. The id
+# weighted sums catch values moving between entries (two ranks swapped)
+# that leave the plain totals unchanged.
+MONTH_WATERMARK_SQL = """
+SELECT
+    strftime('%Y-%m', r.date) AS ym,
+    COUNT(DISTINCT r.race_id),
+    COUNT(e.id), MAX(e.id),
+    COUNT(e.rank), TOTAL(e.rank), SUM(e.id * e.rank),
+    TOTAL(LENGTH(e.finish_time)), TOTAL(LENGTH(e.ganyan)), TOTAL(LENGTH(e.equipment)),
+    SUM(CAST(ROUND(e.agf * 100) AS INTEGER)), SUM(e.id * CAST(ROUND(e.agf * 100) AS INTEGER)),
+    TOTAL(e.hp),
+    SUM(CAST(ROUND(e.weight_kg * 100) AS INTEGER)),
+    TOTAL(r.distance_m), TOTAL(LENGTH(r.surface)),
+    TOTAL(r.data_version)
+FROM races r
+JOIN entries e ON e.race_id = r.race_id
+{where}
+GROUP BY ym
+ORDER BY ym
+"""
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def month_watermarks(conn: Connection, start_date=None, end_date=None) -> Dict[str, str]:
+    """
+    {"YYYY-MM": fingerprint} for every month with entries, limited to the whole
+    months that overlap [start_date, end_date] when given.
+    """
+    where, params = [], {}
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    if start_date:
+        where.append("r.date >= :m_start")
+        params['m_start'] = month_start(start_date).isoformat()
+    if end_date:
+        where.append("r.date < :m_end")
+        params['m_end'] = next_month(end_date).isoformat()
+
+    sql = MONTH_WATERMARK_SQL.format(where=("WHERE " + " AND ".join(where)) if where else "")
+    marks = {}
+    for row in conn.execute(text(sql), params):
+        marks[row[0]] = hashlib.sha1(repr(tuple(row[1:])).encode()).hexdigest()[:16]
+    return marks
+
+
+def data_watermark(conn: Connection, start_date=None, end_date=None) -> str:
+    """Single fingerprint of all months overlapping the range (cache keys)."""
+    marks = month_watermarks(conn, start_date, end_date)
+    return hashlib.sha1(repr(sorted(marks.items())).encode()).hexdigest()[:16]
@@ -0,0 +1,98 @@
+import random
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from ..config import settings
+
+# Capture levels (settings.DEBUG_LEVEL)
+# off      -> no debug I/O at all (production default)
+# failures -> write artifacts for parse failures only
+# sampled  -> failures + a random sample (settings.DEBUG_SAMPLE_RATE) of requests
+# verbose  -> every artifact + DEBUG console lines
+LEVELS = {"off": 0, "failures": 1, "sampled": 2, "verbose": 3}
+
+Content = Union[str, bytes, Callable[[], Union[str, bytes]]]
+
+
+class DebugCapture:
+    def __init__(self, level: str = None, sample_rate: float = None,
+                 directory: Path = None, max_artifacts: int = None):
+        level = (level or settings.DEBUG_LEVEL).lower()
+        self.level = LEVELS.get(level, 0)
+        self.sample_rate = settings.DEBUG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.directory = Path(directory or settings.DEBUG_DIR)
+        self.max_artifacts = settings.DEBUG_MAX_ARTIFACTS if max_artifacts is None else max_artifacts
+        self._rng = random.Random()
+
+    @property
+    def enabled(self) -> bool:
+        return self.level > 0
+
+    @property
+    def verbose(self) -> bool:
+        return self.level >= LEVELS["verbose"]
+
+    def log(self, message: str):
+        """DEBUG console line, only printed in verbose mode."""
+        if self.verbose:
+            print(f"DEBUG: {message}")
+
+    def should_capture(self, failure: bool = False) -> bool:
+        if self.level == 0:
+            return False
+        if failure:
+            return True
+        if self.level >= LEVELS["verbose"]:
+            return True
+        if self.level >= LEVELS["sampled"]:
+            return self._rng.random() < self.sample_rate
+        return False
+
+    def capture(self, kind: str, name: str, content: Content,
+                failure: bool = False, ext: str = ".txt") -> Optional[Path]:
+        """
+        Writes one artifact if the level/sampling allows it.
+        `content` may be a callable so callers don't serialize (e.g. tree.html)
+        when nothing is going to be written.
+        Returns the written path or None.
+        """
+        if not self.should_capture(failure):
+            return None
+
+        if callable(content):
+            content = content()
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            tag = "FAIL" if failure else "sample"
+            safe_name = re.sub(r"[^\w.-]+", "_", name)[:80]
+            path = self.directory / f"{stamp}_{tag}_{kind}_{safe_name}{ext}"
+
+            if isinstance(content, bytes):
+                path.write_bytes(content)
+            else:
+                path.write_text(content or "", encoding="utf-8")
+
+            self._rotate()
+            return path
+        except Exception as e:
+            print(f"Warning: Could not write debug artifact: {e}")
+            return None
+
+    def _rotate(self):
+        """Keeps only the newest `max_artifacts` files in the capture directory."""
+        files = sorted(
+            (p for p in self.directory.iterdir() if p.is_file()),
+            key=lambda p: p.stat().st_mtime
+        )
+        for old in files[:max(0, len(files) - self.max_artifacts)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+debug_capture = DebugCapture()
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from tjk.features.dtypes import apply_dtype_policy
+
+
+def _frame(rank):
+    return pd.DataFrame({
+        'race_no': [1, 2, 3], 'rank': rank, 'hp': [50, 60, 70],
+        'horse': ['A', 'B', 'C'], 'weight': [56.5, 57.0, 58.0],
+    })
+
+
+def test_dtypes_do_not_depend_on_missing_values():
+    # A program day (no ranks yet) must not change the dtype of the finished days
+    complete = apply_dtype_policy(_frame([1, 2, 3]))
+    with_program_day = apply_dtype_policy(_frame([1, 2, np.nan]))
+    assert complete.dtypes.to_dict() == with_program_day.dtypes.to_dict()
+    assert complete['rank'].dtype == 'float32'
+    assert complete['race_no'].dtype == 'int16'
@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from tjk.models.enums import SurfaceType
+from tjk.models.race import Entry, Race
+from tjk.storage import schema  # noqa: F401  (registers the models)
+from tjk.storage.db import Base
+from tjk.storage.repo import TJKRepository
+from tjk.storage.warehouse import ParquetWarehouse
+from tjk.storage.watermark import data_watermark
+
+
+def _race(jockey: str = "A. Jokey", ganyan: str = None) -> Race:
+    race_id = "2024-03-01_İzmir_1"
+    entries = [
+        Entry(race_id=race_id, horse_id=f"H{i}", horse_name=f"AT {i}", saddle_no=i,
+              jockey_name=jockey if i == 1 else f"Jokey {i}", weight_kg=57.0, trainer_id=f"T{i}",
+              hp=60 + i, agf=10.0 * i, rank=i if ganyan else None, ganyan=ganyan)
+        for i in (1, 2, 3)
+    ]
+    return Race(race_id=race_id, date=date(2024, 3, 1), city="İzmir", race_no=1,
+                surface=SurfaceType.KUM, distance_m=1400, entries=entries)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tjk.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def test_in_place_program_edit_moves_watermark(db):
+    repo = TJKRepository(db)
+    repo.upsert_program_day([_race()])
+    before = data_watermark(db.connection())
+
+    # Same entries (ids kept), only the jockey name of one of them changes
+    result = repo.upsert_program_day([_race(jockey="B. Jokey")])
+    assert result['entries'] == 1
+    assert data_watermark(db.connection()) != before
+
+
+def test_in_place_results_correction_moves_watermark(db):
+    repo = TJKRepository(db)
+    repo.upsert_program_day([_race()])
+    repo.update_day_results([_race(ganyan="3,45")])
+    before = data_watermark(db.connection())
+
+    # Same-length ganyan correction: every length / rank aggregate is unchanged
+    repo.update_day_results([_race(ganyan="3,54")])
+    assert data_watermark(db.connection()) != before
+
+
+def test_in_place_edit_makes_warehouse_month_stale(db, tmp_path):
+    pytest.importorskip("pyarrow")
+    repo = TJKRepository(db)
+    repo.upsert_program_day([_race()])
+    warehouse = ParquetWarehouse(tmp_path / "warehouse")
+    warehouse.sync(db.connection())
+    assert warehouse.stale_months(db.connection()) == []
+
+    repo.upsert_program_day([_race(jockey="B. Jokey")])
+    assert warehouse.stale_months(db.connection()) == ["2024-03"]
+
+
+def test_reapplying_same_results_keeps_watermark(db):
+    repo = TJKRepository(db)
+    repo.upsert_program_day([_race()])
+    repo.update_day_results([_race(ganyan="3,45")])
+    before = data_watermark(db.connection())
+
+    result = repo.update_day_results([_race(ganyan="3,45")])
+    assert result == {'updated': 0, 'unmatched': 0}
+    assert data_watermark(db.connection()) == before
@@ -1,19 +1,17 @@
 import sys
 import os
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from src.tjk.storage.schema import RaceModel, EntryModel
-from src.tjk.config import settings
+from src.tjk.storage.read_repo import RaceReadRepository
+from src.tjk.storage.db import read_engine
 
 # Add src to path
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
 def view_data():
-    engine = create_engine(settings.DB_URL)
-    Session = sessionmaker(bind=engine)
+    Session = sessionmaker(bind=read_engine)
     session = Session()
     
-    races = session.query(RaceModel).all()
+    races = RaceReadRepository(session).races_between()
     
     if not races:
         print("Veritabanında hiç yarış bulunamadı.")